@@ -6,6 +6,9 @@ from os import getenv
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
+from api.v1.auth.rate_limit import rate_limiter_from_env
+from models.base import start_publisher
+import math
 import os
 
 
@@ -14,6 +17,10 @@ app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
 AUTH_TYPE = getenv("AUTH_TYPE")
+EXCLUDED_PATHS = list(filter(None, getenv(
+    "AUTH_EXCLUDED_PATHS",
+    "/api/v1/status/,/api/v1/unauthorized/,/api/v1/forbidden/,"
+    "/api/v1/auth_session/login/").split(",")))
 
 if AUTH_TYPE == "auth":
     from api.v1.auth.auth import Auth
@@ -30,6 +37,43 @@ elif AUTH_TYPE == "session_exp_auth":
 elif AUTH_TYPE == "session_db_auth":
     from api.v1.auth.session_db_auth import SessionDBAuth
     auth = SessionDBAuth()
+elif AUTH_TYPE == "signed_session_auth":
+    from api.v1.auth.signed_session_auth import SignedSessionAuth
+    auth = SignedSessionAuth()
+
+limiter = rate_limiter_from_env()
+
+if getenv("SESSION_SNAPSHOT") and \
+        AUTH_TYPE in ("session_auth", "session_exp_auth"):
+    from api.v1.auth.session_snapshot import start_snapshots
+    start_snapshots(auth.backend, getenv("SESSION_SNAPSHOT"),
+                    float(getenv("SESSION_SNAPSHOT_INTERVAL", "60")))
+
+if getenv("SESSION_SWEEP_INTERVAL") and AUTH_TYPE == "session_db_auth":
+    from api.v1.auth.session_sweeper import start_sweeper
+    start_sweeper(auth.session_duration,
+                  float(getenv("SESSION_SWEEP_INTERVAL")))
+
+if getenv("MODELS_PUBLISH_INTERVAL"):
+    start_publisher(float(getenv("MODELS_PUBLISH_INTERVAL")))
+
+
+def credentials_email() -> str:
+    """ Email of a request about to have a password checked: a session
+    login or any request with basic auth credentials. None otherwise.
+    """
+    if request.method == 'POST' and \
+            request.path.rstrip('/') == '/api/v1/auth_session/login':
+        return request.form.get('email') or ''
+    if auth is None or not hasattr(auth, 'extract_user_credentials'):
+        return None
+    header = auth.extract_base64_authorization_header(
+        auth.authorization_header(request))
+    if header is None:
+        return None
+    email, _ = auth.extract_user_credentials(
+        auth.decode_base64_authorization_header(header))
+    return email or ''
 
 
 @app.before_request
@@ -37,13 +81,20 @@ def before_request():
     """ Before request handler
     """
 
+    if limiter is not None:
+        email = credentials_email()
+        if email is not None:
+            retry_after = limiter.hit('ip:{}'.format(request.remote_addr))
+            if not retry_after and email:
+                retry_after = limiter.hit('email:{}'.format(email))
+            if retry_after:
+                return jsonify({"error": "Too many requests"}), 429, \
+                    {'Retry-After': str(math.ceil(retry_after))}
+
     if auth is None:
         return
 
-    excluded_paths = ['/api/v1/status/', '/api/v1/unauthorized/',
-                      '/api/v1/forbidden/', '/api/v1/auth_session/login/']
-
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
 
     if (auth.authorization_header(request) is None and
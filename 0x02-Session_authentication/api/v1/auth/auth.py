@@ -5,16 +5,63 @@ This module provides an `Auth` class for basic authentication functionalities
 in a Flask application.
 """
 
+from collections import OrderedDict
 from os import getenv
 from typing import List, TypeVar
 from flask import request
 
 
+DECISIONS_MAX = int(getenv("AUTH_DECISIONS_MAX", "1024"))
+
+
+class PathNode():
+    """
+    Node of the character trie of excluded paths.
+    """
+
+    __slots__ = ('children', 'exact', 'prefix')
+
+    def __init__(self):
+        """
+        Initialize a node matching nothing.
+        """
+        self.children = {}
+        # An excluded path ends here: matches it and its sub-paths
+        self.exact = False
+        # A wildcard ends here: matches anything starting like this
+        self.prefix = False
+
+
+def compile_excluded_paths(excluded_paths: List[str]) -> PathNode:
+    """
+    Build the trie matching a list of excluded paths.
+    """
+    root = PathNode()
+    for excluded_path in excluded_paths:
+        wildcard = excluded_path.endswith('*')
+        if wildcard:
+            excluded_path = excluded_path.rstrip('*')
+        else:
+            excluded_path = excluded_path.rstrip('/')
+        node = root
+        for char in excluded_path:
+            node = node.children.setdefault(char, PathNode())
+        if wildcard:
+            node.prefix = True
+        else:
+            node.exact = True
+    return root
+
+
 class Auth():
     """
     This class serves as a basic framework for authentication.
     """
 
+    _excluded_paths = None
+    _excluded_trie = None
+    _decisions = None
+
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
         """
         Checks if authentication is required for a given request path.
@@ -23,34 +70,55 @@ class Auth():
             path: The request path (string).
             excluded_paths: A list of paths (strings) exempt from
             authentication. All elements in the list are assumed
-            to end with a trailing slash (/).
+            to end with a trailing slash (/), or with a `*` to exclude
+            every path starting like it.
 
         Returns:
             True if authentication is required, False otherwise.
+
+        The list is compiled into a trie the first time it is seen (pass
+        the same list object on every request) and the last
+        AUTH_DECISIONS_MAX decisions are kept by path.
         """
 
         if path is None or not excluded_paths:
             return True
 
-        # Standardize path by removing trailing slash (if present)
-        path = path.rstrip('/')
-
-        # Check if path is a perfect match or a prefix of any excluded path
-        for excluded_path in excluded_paths:
-            # Handle wildcard at the end of the excluded path
-            if excluded_path.endswith('*'):
-                if path.startswith(excluded_path.rstrip('*')):
-                    return False
-            else:
-                # Standardize excluded path by removing
-                # trailing slash (if present)
-                excluded_path = excluded_path.rstrip('/')
-                if (path == excluded_path or
-                   path.startswith(excluded_path + '/')):
-                    return False
-
-        # No match found, authentication required
-        return True
+        if excluded_paths is not self._excluded_paths:
+            self._excluded_trie = compile_excluded_paths(excluded_paths)
+            self._decisions = OrderedDict()
+            self._excluded_paths = excluded_paths
+
+        decisions = self._decisions
+        required = decisions.get(path)
+        if required is not None:
+            try:
+                decisions.move_to_end(path)
+            except KeyError:
+                pass
+            return required
+
+        required = not self._is_excluded(path.rstrip('/'))
+        decisions[path] = required
+        try:
+            while len(decisions) > DECISIONS_MAX:
+                decisions.popitem(last=False)
+        except KeyError:
+            pass
+        return required
+
+    def _is_excluded(self, path: str) -> bool:
+        """
+        Walk the excluded paths trie along a path without trailing slash.
+        """
+        node = self._excluded_trie
+        for char in path:
+            if node.prefix or (node.exact and char == '/'):
+                return True
+            node = node.children.get(char)
+            if node is None:
+                return False
+        return node.prefix or node.exact
 
     def authorization_header(self, request=None) -> str:
         """
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+"""
+Token-bucket rate limiting of the requests checking a password.
+
+A bucket is kept as a single number, the time at which it is full again
+(generic cell rate algorithm): a bucket that is full again has expired
+and is forgotten. RateLimiter keeps them in a dict of the process,
+SharedRateLimiter in a memory-mapped file of fixed-size slots shared by
+every worker of the host.
+"""
+
+from os import getenv
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+SLOT = struct.Struct('<Qd')
+HEADER = struct.Struct('<8s32s')
+MAGIC = b'RATELIM2'
+
+
+class RateLimiter():
+    """
+    Buckets of `count` requests refilled over `period` seconds, by key.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, count: int, period: float):
+        """
+        Initialize empty buckets.
+        """
+        self.period = period
+        self.interval = period / count
+        self._lock = threading.Lock()
+        self._full_at = {}
+        self._hits = 0
+
+    def hit(self, key: str) -> float:
+        """
+        Take a token from the bucket of a key.
+
+        Returns:
+            0 if there was one, else the seconds to wait for the next one.
+        """
+        with self._locked():
+            now = self.clock()
+            # A bucket is never full later than one period from now,
+            # unless the clock went back
+            full_at = min(max(self._get(key), now), now + self.period) + \
+                self.interval
+            wait = full_at - now - self.period
+            if wait > 0:
+                return wait
+            self._set(key, full_at, now)
+            return 0
+
+    def _locked(self):
+        """
+        Context holding the buckets for one hit.
+        """
+        return self._lock
+
+    def _get(self, key: str) -> float:
+        """
+        Time at which the bucket of a key is full, 0 if unknown.
+        """
+        return self._full_at.get(key, 0)
+
+    def _set(self, key: str, full_at: float, now: float):
+        """
+        Store the bucket of a key, forgetting the full ones once in a
+        while.
+        """
+        self._full_at[key] = full_at
+        self._hits += 1
+        if self._hits >= max(1024, len(self._full_at)):
+            self._hits = 0
+            self._full_at = {k: t for k, t in self._full_at.items()
+                             if t > now}
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Buckets kept in a file mapped by every worker process.
+
+    The file holds a header (magic, hash key) then `slots` (key hash, full
+    at) pairs; keys whose hashes fall in the same slot share it, the last
+    one taking it over. Hashes are keyed with the random key of the file,
+    so that colliding keys can't be crafted to reset a bucket. Times are
+    UTC seconds, which outlive a reboot unlike the monotonic clock.
+    """
+
+    clock = staticmethod(time.time)
+
+    def __init__(self, count: int, period: float, file_path: str,
+                 slots: int = 65536):
+        """
+        Map the buckets file, creating it if needed.
+        """
+        super().__init__(count, period)
+        self.slots = slots
+        size = HEADER.size + slots * SLOT.size
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with _FileLock(self._lock, fd):
+                header = os.pread(fd, HEADER.size, 0)
+                if len(header) < HEADER.size or \
+                        HEADER.unpack(header)[0] != MAGIC:
+                    os.ftruncate(fd, 0)
+                    os.pwrite(fd, HEADER.pack(MAGIC, os.urandom(32)), 0)
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                _, self._hash_key = HEADER.unpack(os.pread(fd, HEADER.size,
+                                                           0))
+            self._map = mmap.mmap(fd, size)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _locked(self):
+        """
+        Context holding the buckets against other threads and processes.
+        """
+        return _FileLock(self._lock, self._fd)
+
+    def _slot(self, key: str) -> tuple:
+        """
+        Hash and slot offset of a key.
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=8,
+                                 key=self._hash_key).digest()
+        key_hash = int.from_bytes(digest, 'little')
+        return key_hash, HEADER.size + (key_hash % self.slots) * SLOT.size
+
+    def _get(self, key: str) -> float:
+        """
+        Time at which the bucket of a key is full, 0 if unknown.
+        """
+        key_hash, offset = self._slot(key)
+        slot_hash, full_at = SLOT.unpack_from(self._map, offset)
+        return full_at if slot_hash == key_hash else 0
+
+    def _set(self, key: str, full_at: float, now: float):
+        """
+        Store the bucket of a key in its slot.
+        """
+        key_hash, offset = self._slot(key)
+        SLOT.pack_into(self._map, offset, key_hash, full_at)
+
+
+class _FileLock():
+    """
+    Thread lock plus exclusive lock on a file.
+    """
+
+    def __init__(self, lock: threading.Lock, fd: int):
+        """
+        Initialize the context.
+        """
+        self._lock = lock
+        self._fd = fd
+
+    def __enter__(self):
+        """
+        Take both locks.
+        """
+        self._lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        """
+        Release both locks.
+        """
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+
+def rate_limiter_from_env() -> RateLimiter:
+    """
+    Build the limiter set by RATE_LIMIT (`<count>/<seconds>`), shared
+    through RATE_LIMIT_FILE if set. None when RATE_LIMIT isn't set.
+    """
+    rate_limit = getenv("RATE_LIMIT")
+    if not rate_limit:
+        return None
+    count, period = rate_limit.split('/')
+    file_path = getenv("RATE_LIMIT_FILE")
+    if file_path:
+        return SharedRateLimiter(int(count), float(period), file_path)
+    return RateLimiter(int(count), float(period))
@@ -3,15 +3,41 @@
 """Session authentication class"""
 
 
+from os import getenv
+import time
 import uuid
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_backend import session_backend_from_env
 from models.user import User
 
 
+SESSION_MAX_PER_USER = int(getenv('SESSION_MAX_PER_USER', '0'))
+
+
 class SessionAuth(Auth):
-    """Session authentication class"""
+    """Session authentication class
+
+    Sessions are kept by `backend`, chosen by SESSION_BACKEND and built
+    with each instance: by default in `user_id_by_session_id`, with
+    `session_ids_by_user_id` indexing the sessions of each user, oldest
+    first, so that they can all be destroyed at once and capped to
+    SESSION_MAX_PER_USER (0 for no cap).
+    """
 
     user_id_by_session_id = {}
+    session_ids_by_user_id = {}
+
+    def __init__(self):
+        """Initialize the session backend"""
+
+        self.backend = self._new_backend()
+
+    def _new_backend(self):
+        """Build the session backend, when instantiated and not on import"""
+
+        return session_backend_from_env(self.user_id_by_session_id,
+                                        self.session_ids_by_user_id,
+                                        SESSION_MAX_PER_USER)
 
     def create_session(self, user_id: str = None) -> str:
         """Create a session"""
@@ -20,17 +46,47 @@ class SessionAuth(Auth):
             return None
 
         session_id = str(uuid.uuid4())
-        self.user_id_by_session_id[session_id] = user_id
+        self.backend.create(session_id, user_id, self._deadline())
 
         return session_id
 
+    def _deadline(self) -> int:
+        """Deadline of a new session in UTC seconds, 0 for none"""
+
+        return 0
+
+    def destroy_user_sessions(self, user_id: str = None) -> int:
+        """Destroy all the sessions of a user, return how many"""
+
+        if not user_id:
+            return 0
+
+        return self.backend.delete_user(user_id)
+
     def user_id_for_session_id(self, session_id: str = None) -> str:
         """Get the user id for a session id"""
 
         if session_id is None or not isinstance(session_id, str):
             return None
 
-        return self.user_id_by_session_id.get(session_id)
+        session = self.backend.get(session_id)
+        if session is None:
+            return None
+
+        user_id, deadline = session
+        if 0 < deadline < int(time.time()):
+            return None
+
+        self._seen(session_id, deadline)
+        return user_id
+
+    def _seen(self, session_id: str, deadline: int):
+        """Hook called on each valid lookup of a session"""
+
+    def session_counts(self) -> tuple:
+        """Number of (active, expired) sessions, None if unknown"""
+
+        return self.backend.count()
 
     def current_user(self, request=None):
         """Get the current user"""
@@ -65,9 +121,4 @@ class SessionAuth(Auth):
         if user_id is None:
             return False
 
-        try:
-            del self.user_id_by_session_id[session_id]
-        except Exception:
-            pass
-
-        return True
+        return self.backend.delete(session_id)
@@ -0,0 +1,817 @@
+#!/usr/bin/env python3
+
+"""
+Stores of the sessions of SessionAuth and its subclasses.
+
+A session is a user id and a deadline, in UTC seconds (0 for none).
+MemoryBackend keeps them in dicts of the process, CompactMemoryBackend
+in a SessionTable of the process, SQLiteBackend in a
+SQLite database in WAL mode and SocketBackend in a session server
+(session_server.py) reached through a Unix socket: with either of the
+last two, every worker sees the sessions created by the others.
+"""
+
+from array import array
+from itertools import repeat
+from os import getenv
+import heapq
+import json
+import os
+import queue
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from api.v1.auth.session_counts import DeadlineCounts
+from api.v1.auth.session_snapshot import load_array, read_snapshot, \
+    write_snapshot
+from api.v1.auth.session_table import SessionTable
+
+
+SQLITE_VARIABLES_MAX = 999
+REAP_EVERY = 1024
+SWEEP_STEPS = 4
+# Count tables of SQLiteBackend and the triggers keeping them: a session
+# is counted among the expired ones when its deadline passed at the last
+# count, else in the bucket of its deadline
+SQLITE_COUNTS = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS session_buckets (
+    deadline INTEGER PRIMARY KEY, sessions INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS session_counts (
+    total INTEGER NOT NULL, expired INTEGER NOT NULL, now INTEGER NOT NULL);
+INSERT INTO session_buckets SELECT deadline, COUNT(*) FROM sessions
+    WHERE deadline > 0 AND NOT EXISTS (SELECT 1 FROM session_counts)
+    GROUP BY deadline;
+INSERT INTO session_counts SELECT COUNT(*), 0, 0 FROM sessions
+    WHERE NOT EXISTS (SELECT 1 FROM session_counts);
+CREATE TRIGGER IF NOT EXISTS sessions_insert AFTER INSERT ON sessions BEGIN
+    UPDATE session_counts SET total = total + 1,
+        expired = expired + (NEW.deadline > 0 AND NEW.deadline < now);
+    INSERT INTO session_buckets SELECT NEW.deadline, 1 FROM session_counts
+        WHERE NEW.deadline > 0 AND NEW.deadline >= now
+        ON CONFLICT (deadline) DO UPDATE SET sessions = sessions + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS sessions_delete AFTER DELETE ON sessions BEGIN
+    UPDATE session_counts SET total = total - 1,
+        expired = expired - (OLD.deadline > 0 AND OLD.deadline < now);
+    UPDATE session_buckets SET sessions = sessions - 1
+        WHERE deadline = OLD.deadline
+        AND deadline >= (SELECT now FROM session_counts);
+END;
+CREATE TRIGGER IF NOT EXISTS sessions_update AFTER UPDATE OF deadline
+ON sessions BEGIN
+    UPDATE session_counts SET
+        expired = expired - (OLD.deadline > 0 AND OLD.deadline < now)
+        + (NEW.deadline > 0 AND NEW.deadline < now);
+    UPDATE session_buckets SET sessions = sessions - 1
+        WHERE deadline = OLD.deadline
+        AND deadline >= (SELECT now FROM session_counts);
+    INSERT INTO session_buckets SELECT NEW.deadline, 1 FROM session_counts
+        WHERE NEW.deadline > 0 AND NEW.deadline >= now
+        ON CONFLICT (deadline) DO UPDATE SET sessions = sessions + 1;
+END;
+COMMIT;
+"""
+
+
+class SessionBackendError(Exception):
+    """
+    Error reported by a session server.
+    """
+
+
+class SessionBackend():
+    """
+    Interface of the session stores.
+
+    Every user keeps at most `max_per_user` sessions (0 for no cap), the
+    oldest ones being destroyed first. `shared` tells if other processes
+    change the sessions too.
+    """
+
+    shared = False
+
+    def __init__(self, max_per_user: int = 0):
+        """
+        Initialize the cap of sessions per user.
+        """
+        self.max_per_user = max_per_user
+
+    def create(self, session_id: str, user_id: str, deadline: int = 0):
+        """
+        Store a new session.
+        """
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> tuple:
+        """
+        (user id, deadline) of a session, None if unknown.
+        """
+        raise NotImplementedError
+
+    def get_many(self, session_ids: list) -> list:
+        """
+        (user id, deadline) or None of each of several sessions.
+        """
+        return [self.get(session_id) for session_id in session_ids]
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Destroy a session, False if unknown.
+        """
+        raise NotImplementedError
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Destroy all the sessions of a user, return how many.
+        """
+        raise NotImplementedError
+
+    def touch_many(self, deadlines: dict):
+        """
+        Move the deadlines of several sessions, {session id: deadline},
+        in one write; unknown sessions and sessions without a deadline are
+        left alone.
+        """
+        raise NotImplementedError
+
+    def reap(self) -> int:
+        """
+        Destroy the sessions whose deadline passed, return how many.
+        """
+        raise NotImplementedError
+
+    def count(self) -> tuple:
+        """
+        Number of (active, expired) sessions, the expired ones being
+        those not reaped yet.
+        """
+        raise NotImplementedError
+
+    def session_ids(self) -> list:
+        """
+        Ids of all the sessions, expired ones included.
+        """
+        raise NotImplementedError
+
+    def snapshot(self, file_path: str, fork: bool = True) -> bool:
+        """
+        Write the sessions kept in process memory to a snapshot file,
+        False when they are kept elsewhere.
+        """
+        return False
+
+    def restore(self, file_path: str) -> int:
+        """
+        Replace the sessions kept in process memory by the unexpired ones
+        of a snapshot file, return how many.
+        """
+        return 0
+
+
+class MemoryBackend(SessionBackend):
+    """
+    Sessions kept in dicts of the process.
+
+    `sessions` maps each session id to its user id, or to a dict of its
+    user id and deadline when it has one; `by_user` maps
+    each user id to its session ids, oldest first. Deadlines are also
+    pushed on a min-heap: every new session first destroys the sessions
+    whose deadline passed, so the dicts only grow with the live sessions.
+    The sessions are counted as they come and go, in DeadlineCounts.
+    """
+
+    def __init__(self, sessions: dict = None, by_user: dict = None,
+                 max_per_user: int = 0):
+        """
+        Initialize the store over the given dicts, or new ones.
+        """
+        super().__init__(max_per_user)
+        self.sessions = {} if sessions is None else sessions
+        self.by_user = {} if by_user is None else by_user
+        self._lock = threading.RLock()
+        self._deadlines = []
+        self._counts = self._recount()
+
+    def create(self, session_id: str, user_id: str, deadline: int = 0):
+        """
+        Store a new session.
+        """
+        with self._lock:
+            self.reap()
+            if session_id in self.sessions:
+                self.delete(session_id)
+            self._counts.add(deadline)
+            if deadline:
+                self.sessions[session_id] = {
+                    'user_id': user_id,
+                    'deadline': deadline
+                }
+                heapq.heappush(self._deadlines, (deadline, session_id))
+            else:
+                self.sessions[session_id] = user_id
+            session_ids = self.by_user.setdefault(user_id, {})
+            session_ids[session_id] = None
+            while 0 < self.max_per_user < len(session_ids):
+                self.delete(next(iter(session_ids)))
+
+    def get(self, session_id: str) -> tuple:
+        """
+        (user id, deadline) of a session, None if unknown.
+        """
+        value = self.sessions.get(session_id)
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            return value.get('user_id'), value.get('deadline', 0)
+        return value, 0
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Destroy a session, False if unknown.
+        """
+        with self._lock:
+            session = self.get(session_id)
+            if session is None:
+                return False
+            del self.sessions[session_id]
+            self._counts.remove(session[1])
+            session_ids = self.by_user.get(session[0])
+            if session_ids is not None:
+                session_ids.pop(session_id, None)
+                if not session_ids:
+                    self.by_user.pop(session[0], None)
+            return True
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Destroy all the sessions of a user, return how many.
+        """
+        with self._lock:
+            session_ids = list(self.by_user.get(user_id, ()))
+            return sum(1 for session_id in session_ids
+                       if self.delete(session_id))
+
+    def touch_many(self, deadlines: dict):
+        """
+        Move the deadlines of several sessions; the heap entries of the
+        previous deadlines are skipped once popped.
+        """
+        with self._lock:
+            for session_id, deadline in deadlines.items():
+                value = self.sessions.get(session_id)
+                if isinstance(value, dict) and value.get('deadline'):
+                    self._counts.move(value['deadline'], deadline)
+                    value['deadline'] = deadline
+                    heapq.heappush(self._deadlines, (deadline, session_id))
+
+    def reap(self) -> int:
+        """
+        Destroy the sessions whose deadline passed, return how many.
+        """
+        now = int(time.time())
+        reaped = 0
+        with self._lock:
+            deadlines = self._deadlines
+            while deadlines and deadlines[0][0] < now:
+                deadline, session_id = heapq.heappop(deadlines)
+                session = self.get(session_id)
+                if session is not None and session[1] == deadline:
+                    self.delete(session_id)
+                    reaped += 1
+        return reaped
+
+    def count(self) -> tuple:
+        """
+        Number of (active, expired) sessions, counted again only when
+        the dicts were changed by another backend over them.
+        """
+        with self._lock:
+            if self._counts.total != len(self.sessions):
+                self._counts = self._recount()
+            return self._counts.counts(int(time.time()))
+
+    def session_ids(self) -> list:
+        """
+        Ids of all the sessions.
+        """
+        with self._lock:
+            return list(self.sessions)
+
+    def _recount(self) -> DeadlineCounts:
+        """
+        Counts of the sessions in the dicts.
+        """
+        return DeadlineCounts(self.get(session_id)[1]
+                              for session_id in list(self.sessions))
+
+    def snapshot(self, file_path: str, fork: bool = True) -> bool:
+        """
+        Write the sessions to a snapshot file.
+        """
+        return write_snapshot(file_path, self._lock, self._dump, fork)
+
+    def _dump(self) -> list:
+        """
+        Sections holding the sessions grouped by user, oldest first: their
+        ids, the user ids, the number of sessions of each user and the
+        deadline of each session.
+        """
+        session_ids, counts, deadlines = [], array('i'), array('q')
+        for user_session_ids in self.by_user.values():
+            session_ids.extend(user_session_ids)
+            counts.append(len(user_session_ids))
+        for session_id in session_ids:
+            value = self.sessions[session_id]
+            deadlines.append(value.get('deadline', 0)
+                             if isinstance(value, dict) else 0)
+        return ['\0'.join(session_ids).encode(),
+                '\0'.join(self.by_user).encode(), counts, deadlines]
+
+    def restore(self, file_path: str) -> int:
+        """
+        Replace the sessions by the unexpired ones of a snapshot file,
+        return how many, in one pass over the users: those without a
+        deadline are added in bulk, the others session by session.
+        """
+        sections = read_snapshot(file_path)
+        if sections is None or len(sections) != 4:
+            return 0
+        session_ids, user_ids = (bytes(section).decode().split('\0')
+                                 if len(section) else []
+                                 for section in sections[:2])
+        user_ids = [sys.intern(user_id) for user_id in user_ids]
+        user_counts = load_array('i', sections[2])
+        deadlines = load_array('q', sections[3])
+        now = int(time.time())
+        with self._lock:
+            sessions, by_user = self.sessions, self.by_user
+            sessions.clear()
+            by_user.clear()
+            self._deadlines = heap = []
+            self._counts = counts = DeadlineCounts()
+            start = 0
+            for user_id, count in zip(user_ids, user_counts):
+                end = start + count
+                if not any(deadlines[start:end]):
+                    user_session_ids = session_ids[start:end]
+                    sessions.update(zip(user_session_ids, repeat(user_id)))
+                    by_user[user_id] = dict.fromkeys(user_session_ids)
+                    counts.total += count
+                    start = end
+                    continue
+                kept = {}
+                for session_id, deadline in zip(session_ids[start:end],
+                                                deadlines[start:end]):
+                    if deadline == 0:
+                        sessions[session_id] = user_id
+                    elif deadline >= now:
+                        sessions[session_id] = {'user_id': user_id,
+                                                'deadline': deadline}
+                        heap.append((deadline, session_id))
+                    else:
+                        continue
+                    kept[session_id] = None
+                    counts.add(deadline)
+                if kept:
+                    by_user[user_id] = kept
+                start = end
+            heapq.heapify(heap)
+            return len(self.sessions)
+
+
+class CompactMemoryBackend(SessionBackend):
+    """
+    Sessions kept in a SessionTable of the process, for session ids that
+    are UUIDs.
+
+    Every new session first checks the next SWEEP_STEPS records of the
+    table for an expired session to destroy, so that the expired
+    sessions stay a fraction of the live ones.
+    """
+
+    def __init__(self, max_per_user: int = 0):
+        """
+        Initialize an empty store.
+        """
+        super().__init__(max_per_user)
+        self.table = SessionTable()
+        self._lock = threading.Lock()
+
+    def create(self, session_id: str, user_id: str, deadline: int = 0):
+        """
+        Store a new session.
+        """
+        with self._lock:
+            table = self.table
+            table.sweep(int(time.time()), SWEEP_STEPS)
+            table.add(session_id, user_id, deadline)
+            if self.max_per_user > 0:
+                session_ids = table.user_sessions(user_id)
+                for session_id in session_ids[:-self.max_per_user]:
+                    table.remove(session_id)
+
+    def get(self, session_id: str) -> tuple:
+        """
+        (user id, deadline) of a session, None if unknown.
+        """
+        with self._lock:
+            return self.table.get(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Destroy a session, False if unknown.
+        """
+        with self._lock:
+            return self.table.remove(session_id) is not None
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Destroy all the sessions of a user, return how many.
+        """
+        with self._lock:
+            session_ids = self.table.user_sessions(user_id)
+            for session_id in session_ids:
+                self.table.remove(session_id)
+            return len(session_ids)
+
+    def touch_many(self, deadlines: dict):
+        """
+        Move the deadlines of several sessions.
+        """
+        with self._lock:
+            for session_id, deadline in deadlines.items():
+                session = self.table.get(session_id)
+                if session is not None and session[1] > 0:
+                    self.table.set_deadline(session_id, deadline)
+
+    def reap(self) -> int:
+        """
+        Destroy the sessions whose deadline passed, return how many.
+        """
+        with self._lock:
+            return self.table.sweep(int(time.time()))
+
+    def count(self) -> tuple:
+        """
+        Number of (active, expired) sessions.
+        """
+        with self._lock:
+            return self.table.counts(int(time.time()))
+
+    def session_ids(self) -> list:
+        """
+        Ids of all the sessions.
+        """
+        with self._lock:
+            return [session_id for session_id, _, _ in self.table]
+
+    def snapshot(self, file_path: str, fork: bool = True) -> bool:
+        """
+        Write the session table to a snapshot file.
+        """
+        return write_snapshot(file_path, self._lock, self.table.dump, fork)
+
+    def restore(self, file_path: str) -> int:
+        """
+        Replace the session table by the one of a snapshot file, less its
+        expired sessions, return how many sessions are left.
+        """
+        sections = read_snapshot(file_path)
+        table = SessionTable.load(sections) if sections is not None \
+            else None
+        if table is None:
+            return 0
+        table.sweep(int(time.time()))
+        with self._lock:
+            self.table = table
+            return len(table)
+
+
+class SQLiteBackend(SessionBackend):
+    """
+    Sessions kept in a SQLite database in WAL mode, shared by the
+    processes of a host.
+
+    Each thread keeps its own connection. Expired sessions are ignored
+    when read and destroyed every REAP_EVERY sessions created.
+
+    Triggers keep the counts of `count` as in DeadlineCounts: the total
+    and expired sessions in the one row of `session_counts`, with the
+    time they were last brought to, and the sessions whose deadline was
+    still ahead then in `session_buckets`, by deadline.
+    """
+
+    shared = True
+
+    def __init__(self, file_path: str, max_per_user: int = 0):
+        """
+        Initialize the store, creating the database if needed.
+        """
+        super().__init__(max_per_user)
+        self.file_path = file_path
+        self._local = threading.local()
+        self._created = 0
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, "
+                "deadline INTEGER NOT NULL)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_user_id "
+                "ON sessions (user_id)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_deadline "
+                "ON sessions (deadline) WHERE deadline > 0")
+        connection.executescript(SQLITE_COUNTS)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Connection of the current thread, opened again after a fork.
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.file_path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            # Count the rows INSERT OR REPLACE deletes
+            connection.execute("PRAGMA recursive_triggers=ON")
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def create(self, session_id: str, user_id: str, deadline: int = 0):
+        """
+        Store a new session.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (session_id, user_id, deadline))
+            if self.max_per_user > 0:
+                connection.execute(
+                    "DELETE FROM sessions WHERE rowid IN ("
+                    "SELECT rowid FROM sessions WHERE user_id = ? "
+                    "ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                    (user_id, self.max_per_user))
+        self._created += 1
+        if self._created % REAP_EVERY == 0:
+            self.reap()
+
+    def get(self, session_id: str) -> tuple:
+        """
+        (user id, deadline) of a session, None if unknown or expired.
+        """
+        return self.get_many([session_id])[0]
+
+    def get_many(self, session_ids: list) -> list:
+        """
+        (user id, deadline) or None of each of several sessions, by
+        queries of up to SQLITE_VARIABLES_MAX sessions.
+        """
+        connection = self._connection()
+        now = int(time.time())
+        found = {}
+        for start in range(0, len(session_ids), SQLITE_VARIABLES_MAX):
+            chunk = session_ids[start:start + SQLITE_VARIABLES_MAX]
+            found.update(
+                (session_id, (user_id, deadline))
+                for session_id, user_id, deadline in connection.execute(
+                    "SELECT session_id, user_id, deadline FROM sessions "
+                    "WHERE session_id IN ({}) AND (deadline = 0 OR "
+                    "deadline >= ?)".format(','.join('?' * len(chunk))),
+                    chunk + [now]))
+        return [found.get(session_id) for session_id in session_ids]
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Destroy a session, False if unknown.
+        """
+        connection = self._connection()
+        with connection:
+            return connection.execute(
+                "DELETE FROM sessions WHERE session_id = ?",
+                (session_id,)).rowcount > 0
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Destroy all the sessions of a user, return how many.
+        """
+        connection = self._connection()
+        with connection:
+            return connection.execute(
+                "DELETE FROM sessions WHERE user_id = ?",
+                (user_id,)).rowcount
+
+    def touch_many(self, deadlines: dict):
+        """
+        Move the deadlines of several sessions in one transaction.
+        """
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "UPDATE sessions SET deadline = ? "
+                "WHERE session_id = ? AND deadline > 0",
+                [(deadline, session_id)
+                 for session_id, deadline in deadlines.items()])
+
+    def reap(self) -> int:
+        """
+        Destroy the sessions whose deadline passed, return how many.
+        """
+        connection = self._connection()
+        with connection:
+            return connection.execute(
+                "DELETE FROM sessions WHERE deadline > 0 AND deadline < ?",
+                (int(time.time()),)).rowcount
+
+    def count(self) -> tuple:
+        """
+        Number of (active, expired) sessions: the buckets whose deadline
+        passed since the last count are added to the expired sessions.
+        """
+        connection = self._connection()
+        now = int(time.time())
+        with connection:
+            connection.execute(
+                "UPDATE session_counts SET now = MAX(now, ?)", (now,))
+            connection.execute(
+                "UPDATE session_counts SET expired = expired + (SELECT "
+                "IFNULL(SUM(sessions), 0) FROM session_buckets WHERE "
+                "deadline < session_counts.now)")
+            connection.execute(
+                "DELETE FROM session_buckets WHERE deadline < "
+                "(SELECT now FROM session_counts)")
+            total, expired = connection.execute(
+                "SELECT total, expired FROM session_counts").fetchone()
+        return total - expired, expired
+
+    def session_ids(self) -> list:
+        """
+        Ids of all the sessions.
+        """
+        return [session_id for session_id, in self._connection().execute(
+            "SELECT session_id FROM sessions")]
+
+
+class SocketBackend(SessionBackend):
+    """
+    Client of a session server listening on a Unix socket.
+
+    Requests are JSON lines `[method, arguments...]` answered in order by
+    `{"result": ...}` or `{"error": ...}` lines, so several requests are
+    sent at once (`pipeline`) before reading their answers. Connections
+    are pooled, up to `pool_size` idle ones being kept. The cap of
+    sessions per user is the one of the server.
+    """
+
+    shared = True
+
+    def __init__(self, file_path: str, max_per_user: int = 0,
+                 pool_size: int = 8):
+        """
+        Initialize the client, connecting on the first request.
+        """
+        super().__init__(max_per_user)
+        self.file_path = file_path
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        self._pid = os.getpid()
+
+    def _connect(self) -> tuple:
+        """
+        Idle connection of the pool, or a new one, as (socket, file).
+        """
+        if self._pid != os.getpid():
+            self._pool, self._pid = queue.LifoQueue(), os.getpid()
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.file_path)
+            except OSError:
+                sock.close()
+                raise
+            return sock, sock.makefile('rb')
+
+    def _release(self, connection: tuple):
+        """
+        Give back a connection to the pool, or close it if full.
+        """
+        if self._pool.qsize() < self.pool_size:
+            self._pool.put(connection)
+        else:
+            connection[1].close()
+            connection[0].close()
+
+    def pipeline(self, calls: list) -> list:
+        """
+        Send several `(method, arguments...)` requests at once, return
+        their results in order.
+        """
+        connection = self._connect()
+        try:
+            sock, lines = connection
+            sock.sendall(b''.join(json.dumps(call).encode() + b'\n'
+                                  for call in calls))
+            answers = []
+            for _ in calls:
+                line = lines.readline()
+                if not line:
+                    raise ConnectionError("session server closed")
+                answers.append(json.loads(line))
+        except Exception:
+            connection[1].close()
+            connection[0].close()
+            raise
+        self._release(connection)
+        for answer in answers:
+            if 'error' in answer:
+                raise SessionBackendError(answer['error'])
+        return [answer['result'] for answer in answers]
+
+    def _call(self, *call):
+        """
+        Send one request, return its result.
+        """
+        return self.pipeline([call])[0]
+
+    def create(self, session_id: str, user_id: str, deadline: int = 0):
+        """
+        Store a new session.
+        """
+        self._call('create', session_id, user_id, deadline)
+
+    def get(self, session_id: str) -> tuple:
+        """
+        (user id, deadline) of a session, None if unknown.
+        """
+        return self.get_many([session_id])[0]
+
+    def get_many(self, session_ids: list) -> list:
+        """
+        (user id, deadline) or None of each of several sessions, in one
+        request.
+        """
+        return [tuple(session) if session is not None else None
+                for session in self._call('get_many', list(session_ids))]
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Destroy a session, False if unknown.
+        """
+        return self._call('delete', session_id)
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Destroy all the sessions of a user, return how many.
+        """
+        return self._call('delete_user', user_id)
+
+    def touch_many(self, deadlines: dict):
+        """
+        Move the deadlines of several sessions, in one request.
+        """
+        self._call('touch_many', deadlines)
+
+    def reap(self) -> int:
+        """
+        Destroy the sessions whose deadline passed, return how many.
+        """
+        return self._call('reap')
+
+    def count(self) -> tuple:
+        """
+        Number of (active, expired) sessions.
+        """
+        return tuple(self._call('count'))
+
+    def session_ids(self) -> list:
+        """
+        Ids of all the sessions, in one request.
+        """
+        return self._call('session_ids')
+
+
+def session_backend_from_env(sessions: dict = None, by_user: dict = None,
+                             max_per_user: int = 0,
+                             compact: bool = False) -> SessionBackend:
+    """
+    Build the store set by SESSION_BACKEND: `memory` (default) over the
+    given dicts, or in a SessionTable when `compact`, `sqlite` or
+    `socket` at SESSION_BACKEND_PATH.
+    """
+    backend = getenv("SESSION_BACKEND", "memory")
+    if backend == "sqlite":
+        return SQLiteBackend(getenv("SESSION_BACKEND_PATH", ".sessions.db"),
+                             max_per_user)
+    if backend == "socket":
+        return SocketBackend(getenv("SESSION_BACKEND_PATH",
+                                    ".sessions.sock"), max_per_user)
+    if compact:
+        return CompactMemoryBackend(max_per_user)
+    return MemoryBackend(sessions, by_user, max_per_user)
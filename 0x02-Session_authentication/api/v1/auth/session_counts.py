@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Running counts of active and expired sessions.
+
+A store tells DeadlineCounts the deadline of every session it adds,
+moves or removes; counting then costs no scan of the sessions. Sessions
+whose deadline is still ahead are counted in buckets by deadline, and a
+min-heap of those deadlines moves each bucket to the expired count once
+its second has passed. Buckets stay until then, even empty, so each
+deadline is pushed and moved once.
+"""
+
+import heapq
+
+
+class DeadlineCounts():
+    """
+    Number of sessions, and of those whose deadline (0 for none) passed.
+
+    Times are integer seconds. A deadline is expired once it is before
+    the latest `now` given to `counts`. Not thread safe.
+    """
+
+    def __init__(self, deadlines=()):
+        """
+        Initialize the counts, with sessions of the given deadlines.
+        """
+        self.total = 0
+        self.expired = 0
+        self._now = 0
+        self._pending = {}
+        self._heap = []
+        for deadline in deadlines:
+            self.add(deadline)
+
+    def add(self, deadline: int):
+        """
+        Count a new session.
+        """
+        self.total += 1
+        if deadline <= 0:
+            return
+        if deadline < self._now:
+            self.expired += 1
+            return
+        count = self._pending.get(deadline)
+        if count is None:
+            heapq.heappush(self._heap, deadline)
+            count = 0
+        self._pending[deadline] = count + 1
+
+    def remove(self, deadline: int):
+        """
+        Stop counting a session.
+        """
+        self.total -= 1
+        if deadline <= 0:
+            return
+        if deadline < self._now:
+            self.expired -= 1
+            return
+        self._pending[deadline] -= 1
+
+    def move(self, old: int, new: int):
+        """
+        Count a session under a new deadline.
+        """
+        self.remove(old)
+        self.add(new)
+
+    def counts(self, now: int) -> tuple:
+        """
+        Number of (active, expired) sessions at `now`.
+        """
+        self._now = now = max(self._now, now)
+        heap, pending = self._heap, self._pending
+        while heap and heap[0] < now:
+            self.expired += pending.pop(heapq.heappop(heap))
+        return self.total - self.expired, self.expired
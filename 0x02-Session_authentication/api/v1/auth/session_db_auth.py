@@ -2,70 +2,108 @@
 
 """Manage session authentication with database"""
 
-from datetime import datetime, timedelta
+import calendar
+import time
 from models.user_session import UserSession
+from api.v1.auth.session_auth import SESSION_MAX_PER_USER
+from api.v1.auth.session_backend import SessionBackend
 from api.v1.auth.session_exp_auth import SessionExpAuth
 
 
-class SessionDBAuth(SessionExpAuth):
-    """SessionDBAuth class to manage session authentication with database"""
+class UserSessionBackend(SessionBackend):
+    """Sessions kept in the UserSession store
 
-    def create_session(self, user_id=None):
-        """ Create a session and store it in the database """
-        session_id = super().create_session(user_id)
-        if not session_id:
-            return None
+    Lookups go through its session_id index, kept in step with the other
+    processes by the store journal, and creating or destroying a session
+    is a single journal write. The user_id index finds the sessions of a
+    user. Deadlines are `duration` seconds after `updated_at`, which is
+    `created_at` until the deadline is moved by saving the session again;
+    0, none, when `duration` isn't positive.
+    """
 
-        session_info = {
-            'user_id': user_id,
-            'session_id': session_id
-        }
-        user_session = UserSession(**session_info)
-        user_session.save()
-        UserSession.save_to_file()
-        return session_id
+    shared = True
 
-    def user_id_for_session_id(self, session_id=None):
-        """ Retrieve a user ID based on a session ID """
-        if not session_id:
-            return None
+    def __init__(self, duration=0, max_per_user=0):
+        """ Initialize the session duration and the cap per user """
+        super().__init__(max_per_user)
+        self.duration = duration
 
-        UserSession.load_from_file()
+    def create(self, session_id, user_id, deadline=0):
+        """ Store a new session """
+        user_session = UserSession(user_id=user_id, session_id=session_id)
+        user_session.save()
+        if self.max_per_user > 0:
+            sessions = UserSession.search({'user_id': user_id})
+            if len(sessions) > self.max_per_user:
+                sessions.sort(key=lambda session: (session.created_at,
+                                                   session is user_session))
+                UserSession.remove_many(
+                    [session.id for session
+                     in sessions[:len(sessions) - self.max_per_user]])
+
+    def get(self, session_id):
+        """ (user id, deadline) of a session, None if unknown """
         sessions = UserSession.search({'session_id': session_id})
-
         if not sessions:
             return None
 
         session = sessions[0]
-        session_time = session.created_at + \
-            timedelta(seconds=self.session_duration)
-
-        if datetime.now() > session_time:
-            return None
+        if self.duration <= 0:
+            return session.user_id, 0
+        updated_at = calendar.timegm(session.updated_at.utctimetuple())
+        return session.user_id, updated_at + self.duration
 
-        return session.user_id
+    def delete(self, session_id):
+        """ Destroy a session, False if unknown """
+        sessions = UserSession.search({'session_id': session_id})
+        return any(UserSession.remove_many([session.id
+                                            for session in sessions]))
+
+    def delete_user(self, user_id):
+        """ Destroy all the sessions of a user, return how many """
+        sessions = UserSession.search({'user_id': user_id})
+        return sum(UserSession.remove_many([session.id
+                                            for session in sessions]))
+
+    def touch_many(self, deadlines):
+        """ Move the deadlines of several sessions to `duration` seconds
+        from now, with a single journal write
+        """
+        UserSession.save_many(
+            [session for session_id in deadlines
+             for session in UserSession.search({'session_id': session_id})])
+
+    def reap(self):
+        """ Destroy the sessions whose deadline passed, return how many """
+        if self.duration <= 0:
+            return 0
+        expired = UserSession.query(between={
+            'updated_at': (None, int(time.time()) - self.duration - 1)})
+        return sum(UserSession.remove_many([session.id
+                                            for session in expired]))
+
+    def count(self):
+        """ Number of (active, expired) sessions, by the updated_at index """
+        expired = 0
+        if self.duration > 0:
+            expired = UserSession.count_between(
+                'updated_at', None, int(time.time()) - self.duration - 1)
+        return UserSession.count() - expired, expired
+
+    def session_ids(self):
+        """ Ids of all the sessions """
+        return [session.session_id for session in UserSession.iter_all()]
 
-    def destroy_session(self, request=None):
-        """ Delete a session from the database """
-        if not request:
-            return False
 
-        session_id = self.session_cookie(request)
-        if not session_id:
-            return False
+class SessionDBAuth(SessionExpAuth):
+    """SessionDBAuth class to manage session authentication with database
 
-        user_id = self.user_id_for_session_id(session_id)
-        if not user_id:
-            return False
+    Sessions only live in the UserSession store, through a
+    UserSessionBackend: it is already shared by every worker, so
+    SESSION_BACKEND doesn't apply.
+    """
 
-        sessions = UserSession.search({'session_id': session_id})
-        if not sessions:
-            return False
-
-        session = sessions[0]
-        try:
-            session.remove()
-            UserSession.save_to_file()
-            return True
-        except Exception:
-            return False
+    def _new_backend(self):
+        """ Build the UserSession backend """
+        return UserSessionBackend(self.session_duration,
+                                  SESSION_MAX_PER_USER)
@@ -2,61 +2,104 @@
 
 """Session authentication with expiration"""
 
-from datetime import datetime, timedelta
 import os
-from api.v1.auth.session_auth import SessionAuth
+import threading
+import time
+from api.v1.auth.session_auth import SESSION_MAX_PER_USER, SessionAuth
+from api.v1.auth.session_backend import session_backend_from_env
 
 
 class SessionExpAuth(SessionAuth):
-    """Session authentication with expiration"""
+    """Session authentication with expiration
+
+    Each session gets a deadline SESSION_DURATION seconds after its
+    creation, past which the backend ignores and evicts it. In memory,
+    sessions are kept in a compact SessionTable rather than dicts.
+
+    With SESSION_REFRESH_INTERVAL set, expiration slides: a session used
+    at least that many seconds after its deadline was last set gets a new
+    one, SESSION_DURATION seconds from now. The new deadlines are written
+    to the backend together, once per SESSION_FLUSH_INTERVAL seconds.
+    """
+
     def __init__(self):
         """
-        Initialize the session duration from environment variables
+        Initialize the session duration and the sliding expiration
+        intervals from environment variables
         """
 
         try:
             self.session_duration = int(os.getenv('SESSION_DURATION', '0'))
         except ValueError:
             self.session_duration = 0
+        try:
+            self.refresh_interval = int(
+                os.getenv('SESSION_REFRESH_INTERVAL', '0'))
+        except ValueError:
+            self.refresh_interval = 0
+        try:
+            self.flush_interval = float(
+                os.getenv('SESSION_FLUSH_INTERVAL', '1'))
+        except ValueError:
+            self.flush_interval = 1.0
 
-    def create_session(self, user_id=None):
+        self._refresh_lock = threading.Lock()
+        self._refreshed = {}
+        self._flush_timer = None
+        super().__init__()
+
+    def _new_backend(self):
         """
-        Create a session with an expiration time
+        Build the session backend, in a SessionTable in memory
         """
 
-        session_id = super().create_session(user_id)
-        if not session_id:
-            return None
-
-        session_dict = {
-            'user_id': user_id,
-            'created_at': datetime.now()
-        }
+        return session_backend_from_env(max_per_user=SESSION_MAX_PER_USER,
+                                        compact=True)
 
-        self.user_id_by_session_id[session_id] = session_dict
-        return session_id
-
-    def user_id_for_session_id(self, session_id=None):
+    def _deadline(self) -> int:
         """
-        Return user_id based on the session ID and its expiration
+        Deadline of a new session in UTC seconds, 0 for none
         """
-        if not session_id:
-            return None
-
-        session_dict = self.user_id_by_session_id.get(session_id)
-        if not session_dict:
-            return None
 
         if self.session_duration <= 0:
-            return session_dict.get('user_id')
+            return 0
+        return int(time.time()) + self.session_duration
 
-        if 'created_at' not in session_dict:
-            return None
+    def _seen(self, session_id, deadline):
+        """
+        Queue a new deadline for a session in use whose deadline was set
+        at least SESSION_REFRESH_INTERVAL seconds ago
+        """
 
-        creation_time = session_dict['created_at']
-        expired_time = creation_time + timedelta(seconds=self.session_duration)
+        if self.refresh_interval <= 0 or self.session_duration <= 0 or \
+                deadline <= 0:
+            return
+        now = int(time.time())
+        if deadline - self.session_duration + self.refresh_interval > now:
+            return
+        with self._refresh_lock:
+            if session_id in self._refreshed:
+                return
+            self._refreshed[session_id] = now + self.session_duration
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval,
+                                                    self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """
+        Write the queued deadlines to the backend at once
+        """
 
-        if expired_time < datetime.now():
-            return None
+        with self._refresh_lock:
+            refreshed, self._refreshed = self._refreshed, {}
+            self._flush_timer = None
+        if refreshed:
+            self.backend.touch_many(refreshed)
 
-        return session_dict.get('user_id')
+    def reap(self) -> int:
+        """
+        Remove the sessions whose deadline passed, return how many
+        """
+        return self.backend.reap()
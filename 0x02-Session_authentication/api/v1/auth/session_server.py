@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+Session server shared by the workers of a host through a Unix socket.
+
+It keeps the sessions in a CompactMemoryBackend and answers the JSON
+line requests of SocketBackend, standing in for a networked session
+store:
+
+    python3 -m api.v1.auth.session_server [socket path]
+
+The socket path defaults to SESSION_BACKEND_PATH, then .sessions.sock;
+SESSION_MAX_PER_USER caps the sessions of each user. With SESSION_SNAPSHOT
+set, the sessions are restored from that file and written back to it
+every SESSION_SNAPSHOT_INTERVAL seconds (60 by default) and at exit.
+"""
+
+from os import getenv
+import asyncio
+import json
+import os
+import signal
+import sys
+from api.v1.auth.session_backend import CompactMemoryBackend
+from api.v1.auth.session_snapshot import start_snapshots
+
+
+METHODS = ('create', 'get', 'get_many', 'delete', 'delete_user',
+           'touch_many', 'reap', 'count', 'session_ids')
+LINE_MAX = 1 << 24
+WRITE_BUFFER_MAX = 1 << 16
+
+
+def answer(backend: CompactMemoryBackend, line: bytes) -> bytes:
+    """
+    Run one request line against the sessions, return the answer line.
+    """
+    try:
+        method, *arguments = json.loads(line)
+        if method not in METHODS:
+            raise ValueError("unknown method {}".format(method))
+        reply = {'result': getattr(backend, method)(*arguments)}
+    except Exception as e:
+        reply = {'error': repr(e)}
+    return json.dumps(reply).encode() + b'\n'
+
+
+async def serve_client(backend: CompactMemoryBackend, reader,
+                       writer):
+    """
+    Answer the requests of a client in order; the answers of pipelined
+    requests are written out together.
+    """
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            writer.write(answer(backend, line))
+            if writer.transport.get_write_buffer_size() > WRITE_BUFFER_MAX:
+                await writer.drain()
+    except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(file_path: str, backend: CompactMemoryBackend):
+    """
+    Listen on a Unix socket until cancelled.
+    """
+    if os.path.exists(file_path):
+        os.unlink(file_path)
+    server = await asyncio.start_unix_server(
+        lambda reader, writer: serve_client(backend, reader, writer),
+        file_path, limit=LINE_MAX)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    file_path = sys.argv[1] if len(sys.argv) > 1 else \
+        getenv("SESSION_BACKEND_PATH", ".sessions.sock")
+    backend = CompactMemoryBackend(
+        max_per_user=int(getenv('SESSION_MAX_PER_USER', '0')))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if getenv("SESSION_SNAPSHOT"):
+        start_snapshots(backend, getenv("SESSION_SNAPSHOT"),
+                        float(getenv("SESSION_SNAPSHOT_INTERVAL", "60")))
+    try:
+        asyncio.run(serve(file_path, backend))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""
+Snapshots of the sessions kept in process memory.
+
+A snapshot file is a header (magic, byte order, number of sections), the
+lengths of the sections and the sections, raw bytes laid out by the
+backend that wrote them. Snapshots are written by a forked child from
+its copy-on-write view of the sessions, so that the workers keep
+serving, to a temporary file renamed over the previous snapshot.
+"""
+
+from array import array
+import atexit
+import os
+import struct
+import sys
+import threading
+import time
+
+
+MAGIC = b'SESSNAP1'
+HEADER = struct.Struct('<8scI')
+
+
+def write_snapshot(file_path: str, lock, dump, fork: bool = True) -> bool:
+    """
+    Write the sections returned by `dump()`, called holding `lock`, to a
+    snapshot file; from a forked child unless `fork` is False or the
+    platform can't fork. Return whether the snapshot was written.
+    """
+    fork = fork and hasattr(os, 'fork')
+    with lock:
+        if fork:
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    _write(file_path, dump())
+                    code = 0
+                finally:
+                    os._exit(code)
+        else:
+            sections = [bytes(section) for section in dump()]
+    if not fork:
+        _write(file_path, sections)
+        return True
+    _, status = os.waitpid(pid, 0)
+    return status == 0
+
+
+def _write(file_path: str, sections: list):
+    """
+    Write sections to a temporary file, then rename it over `file_path`.
+    """
+    tmp_path = "{}.{}.tmp".format(file_path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, sys.byteorder[0].encode(), len(sections)))
+        f.write(struct.pack('<{}Q'.format(len(sections)),
+                            *(memoryview(section).nbytes
+                              for section in sections)))
+        for section in sections:
+            f.write(section)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def read_snapshot(file_path: str) -> list:
+    """
+    Sections of a snapshot file as memoryviews, None when the file is
+    missing, invalid or from a machine of another byte order.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            data = memoryview(f.read())
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, byteorder, count = HEADER.unpack_from(data)
+    if magic != MAGIC or byteorder != sys.byteorder[0].encode():
+        return None
+    offset = HEADER.size + 8 * count
+    if len(data) < offset:
+        return None
+    sections = []
+    for length in struct.unpack_from('<{}Q'.format(count), data,
+                                     HEADER.size):
+        sections.append(data[offset:offset + length])
+        offset += length
+    if offset != len(data):
+        return None
+    return sections
+
+
+def load_array(typecode: str, section) -> array:
+    """
+    Array of a snapshot section.
+    """
+    items = array(typecode)
+    items.frombytes(section)
+    return items
+
+
+def start_snapshots(backend, file_path: str,
+                    interval: float) -> threading.Thread:
+    """
+    Restore the sessions of a backend from a snapshot file, then write
+    it again every `interval` seconds from a daemon thread and once more
+    at exit
+    """
+    backend.restore(file_path)
+
+    def snapshot():
+        while True:
+            time.sleep(interval)
+            backend.snapshot(file_path)
+
+    atexit.register(backend.snapshot, file_path, False)
+    thread = threading.Thread(target=snapshot, daemon=True)
+    thread.start()
+    return thread
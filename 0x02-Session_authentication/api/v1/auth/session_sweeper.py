@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""
+Sweeper of the expired sessions of the UserSession store.
+
+Logging out is the only other way a UserSession goes away, so the store
+files would otherwise keep every expired session and each load and
+compaction would read them again. A sweep removes the sessions idle for
+more than SESSION_DURATION seconds, then compacts the store: every shard
+file is written aside and renamed in place, holding only the live
+sessions. The API sweeps from a daemon thread every
+SESSION_SWEEP_INTERVAL seconds when set; a sweep can also be run once:
+
+    python3 -m api.v1.auth.session_sweeper [duration]
+"""
+
+from os import getenv
+import sys
+import threading
+import time
+from models.user_session import UserSession
+from api.v1.auth.session_db_auth import UserSessionBackend
+
+
+def sweep(duration: int) -> int:
+    """
+    Remove the sessions idle for more than `duration` seconds, then
+    compact the store if there were any; return how many. Nothing
+    expires without a positive duration.
+    """
+    if duration <= 0:
+        return 0
+    reclaimed = UserSessionBackend(duration).reap()
+    if reclaimed:
+        UserSession.save_to_file()
+    return reclaimed
+
+
+def start_sweeper(duration: int, interval: float) -> threading.Thread:
+    """
+    Sweep the expired sessions every `interval` seconds from a daemon
+    thread
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            sweep(duration)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    duration = sys.argv[1] if len(sys.argv) > 1 else \
+        getenv("SESSION_DURATION", "0")
+    try:
+        duration = int(duration)
+    except ValueError:
+        print("Usage: {} [duration]".format(sys.argv[0]))
+        sys.exit(1)
+    print("{} sessions reclaimed".format(sweep(duration)))
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+"""
+Compact table of sessions keyed by their UUID.
+
+Sessions are records in parallel arrays: the 16 bytes of the session
+UUID, the number of the interned user id, the deadline and the next
+record of the same user, so that the sessions of a user are a list,
+oldest first. An open addressing index of record numbers, probed
+linearly from the first bytes of the UUID, finds a session; freed
+records are reused. A session takes 40 to 60 bytes, against several
+hundred for a str key mapped to a dict. Active and expired sessions are
+counted as they come and go, in DeadlineCounts.
+"""
+
+from array import array
+import sys
+from api.v1.auth.session_counts import DeadlineCounts
+from api.v1.auth.session_snapshot import load_array
+
+
+RECORD_NONE = -1
+SLOT_EMPTY = 0
+SLOT_DELETED = -1
+
+
+def session_key(session_id: str) -> bytes:
+    """
+    16 bytes of a session UUID, None if it isn't one.
+    """
+    if type(session_id) is not str or len(session_id) != 36 or \
+            session_id[8] != '-' or session_id[13] != '-' or \
+            session_id[18] != '-' or session_id[23] != '-':
+        return None
+    try:
+        key = bytes.fromhex(session_id.replace('-', ''))
+    except ValueError:
+        return None
+    return key if len(key) == 16 else None
+
+
+def session_id_of(key: bytes) -> str:
+    """
+    Session UUID of 16 bytes.
+    """
+    digits = key.hex()
+    return '{}-{}-{}-{}-{}'.format(digits[:8], digits[8:12], digits[12:16],
+                                   digits[16:20], digits[20:])
+
+
+class SessionTable():
+    """
+    Sessions as (user id, deadline) by session UUID.
+
+    Deadlines are integer seconds, 0 for none. Not thread safe.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Initialize an empty table, its index sized for `capacity` slots
+        (a power of 2).
+        """
+        self._index = array('i', bytes(4 * capacity))
+        self._mask = capacity - 1
+        self._used = 0
+        self._keys = bytearray()
+        self._users = array('i')
+        self._deadlines = array('q')
+        self._next = array('i')
+        self._free = RECORD_NONE
+        self._count = 0
+        self._hand = 0
+        self.user_ids = []
+        self._user_numbers = {}
+        self._heads = array('i')
+        self._tails = array('i')
+        self._counts = DeadlineCounts()
+
+    def __len__(self) -> int:
+        """
+        Number of sessions.
+        """
+        return self._count
+
+    def __iter__(self):
+        """
+        Iterate over the sessions as (session id, user id, deadline).
+        """
+        users, deadlines, keys = self._users, self._deadlines, self._keys
+        for record in range(len(users)):
+            user = users[record]
+            if user >= 0:
+                yield (session_id_of(keys[record << 4:(record + 1) << 4]),
+                       self.user_ids[user], deadlines[record])
+
+    def dump(self) -> list:
+        """
+        Sections holding the table, for a snapshot.
+        """
+        return [array('q', [self._used, self._free, self._count, self._hand]),
+                self._index, self._keys, self._users, self._deadlines,
+                self._next, self._heads, self._tails,
+                '\0'.join(self.user_ids).encode()]
+
+    @classmethod
+    def load(cls, sections: list) -> 'SessionTable':
+        """
+        Table of the sections written by `dump`, None if they don't hold
+        one.
+        """
+        if len(sections) != 9:
+            return None
+        table = cls()
+        (scalars, table._index, table._users, table._deadlines, table._next,
+         table._heads, table._tails) = (
+            load_array(typecode, section) for typecode, section
+            in zip('qiiqiii', sections[:2] + sections[3:8]))
+        table._keys = bytearray(sections[2])
+        user_ids = bytes(sections[8]).decode()
+        table.user_ids = [sys.intern(user_id)
+                          for user_id in user_ids.split('\0')] \
+            if user_ids else []
+        capacity, records = len(table._index), len(table._users)
+        if len(scalars) != 4 or capacity & (capacity - 1) or \
+                len(table._keys) != records << 4 or \
+                len(table._deadlines) != records or \
+                len(table._next) != records or \
+                len(table._heads) != len(table.user_ids) or \
+                len(table._tails) != len(table.user_ids):
+            return None
+        table._used, table._free, table._count, table._hand = scalars
+        table._mask = capacity - 1
+        table._user_numbers = {user_id: number for number, user_id
+                               in enumerate(table.user_ids)}
+        table._counts = DeadlineCounts(
+            deadline for user, deadline in zip(table._users, table._deadlines)
+            if user >= 0)
+        return table
+
+    def _find(self, key: bytes) -> tuple:
+        """
+        (index slot, record) of a key, the record being RECORD_NONE when
+        missing.
+        """
+        index, mask, keys = self._index, self._mask, self._keys
+        slot = int.from_bytes(key[:8], sys.byteorder) & mask
+        while True:
+            value = index[slot]
+            if value == SLOT_EMPTY:
+                return slot, RECORD_NONE
+            if value > 0:
+                offset = (value - 1) << 4
+                if keys[offset:offset + 16] == key:
+                    return slot, value - 1
+            slot = (slot + 1) & mask
+
+    def _insert(self, key: bytes, record: int):
+        """
+        Index a record under a key known to be missing.
+        """
+        index, mask = self._index, self._mask
+        slot = int.from_bytes(key[:8], sys.byteorder) & mask
+        while index[slot] > 0:
+            slot = (slot + 1) & mask
+        if index[slot] == SLOT_EMPTY:
+            self._used += 1
+        index[slot] = record + 1
+
+    def _resize(self):
+        """
+        Rebuild the index without deleted slots, twice as large when more
+        than half full.
+        """
+        capacity = len(self._index)
+        while (self._count + 1) * 2 > capacity:
+            capacity *= 2
+        index = self._index = array('i', bytes(4 * capacity))
+        mask = self._mask = capacity - 1
+        with memoryview(self._keys) as view, view.cast('Q') as words:
+            hashes = words[::2].tolist()
+        for record, (user, key_hash) in enumerate(zip(self._users, hashes)):
+            if user >= 0:
+                slot = key_hash & mask
+                while index[slot]:
+                    slot = (slot + 1) & mask
+                index[slot] = record + 1
+        self._used = self._count
+
+    def _user_number(self, user_id: str) -> int:
+        """
+        Number of a user id, interning it the first time.
+        """
+        number = self._user_numbers.get(user_id)
+        if number is None:
+            number = len(self.user_ids)
+            user_id = sys.intern(user_id)
+            self.user_ids.append(user_id)
+            self._user_numbers[user_id] = number
+            self._heads.append(RECORD_NONE)
+            self._tails.append(RECORD_NONE)
+        return number
+
+    def add(self, session_id: str, user_id: str, deadline: int = 0):
+        """
+        Store a session, replacing any with the same id; ValueError when
+        the id isn't a UUID.
+        """
+        key = session_key(session_id)
+        if key is None:
+            raise ValueError("not a session UUID: {!r}".format(session_id))
+        slot, record = self._find(key)
+        if record != RECORD_NONE:
+            self._remove(slot, record)
+        if (self._used + 1) * 4 > len(self._index) * 3:
+            self._resize()
+
+        user = self._user_number(user_id)
+        record = self._free
+        if record == RECORD_NONE:
+            record = len(self._users)
+            self._keys += key
+            self._users.append(user)
+            self._deadlines.append(deadline)
+            self._next.append(RECORD_NONE)
+        else:
+            self._free = self._next[record]
+            self._keys[record << 4:(record + 1) << 4] = key
+            self._users[record] = user
+            self._deadlines[record] = deadline
+            self._next[record] = RECORD_NONE
+
+        tail = self._tails[user]
+        if tail == RECORD_NONE:
+            self._heads[user] = record
+        else:
+            self._next[tail] = record
+        self._tails[user] = record
+        self._count += 1
+        self._counts.add(deadline)
+        self._insert(key, record)
+
+    def get(self, session_id: str) -> tuple:
+        """
+        (user id, deadline) of a session, None if unknown.
+        """
+        key = session_key(session_id)
+        if key is None:
+            return None
+        _, record = self._find(key)
+        if record == RECORD_NONE:
+            return None
+        return self.user_ids[self._users[record]], self._deadlines[record]
+
+    def set_deadline(self, session_id: str, deadline: int) -> bool:
+        """
+        Change the deadline of a session, False if unknown.
+        """
+        key = session_key(session_id)
+        if key is None:
+            return False
+        _, record = self._find(key)
+        if record == RECORD_NONE:
+            return False
+        self._counts.move(self._deadlines[record], deadline)
+        self._deadlines[record] = deadline
+        return True
+
+    def remove(self, session_id: str) -> tuple:
+        """
+        Remove a session, return its (user id, deadline) or None if
+        unknown.
+        """
+        key = session_key(session_id)
+        if key is None:
+            return None
+        slot, record = self._find(key)
+        if record == RECORD_NONE:
+            return None
+        return self._remove(slot, record)
+
+    def _remove(self, slot: int, record: int) -> tuple:
+        """
+        Remove the session of an index slot and its record.
+        """
+        index, mask = self._index, self._mask
+        if index[(slot + 1) & mask] == SLOT_EMPTY:
+            index[slot] = SLOT_EMPTY
+            self._used -= 1
+        else:
+            index[slot] = SLOT_DELETED
+
+        user = self._users[record]
+        previous, current = RECORD_NONE, self._heads[user]
+        while current != record:
+            previous, current = current, self._next[current]
+        following = self._next[record]
+        if previous == RECORD_NONE:
+            self._heads[user] = following
+        else:
+            self._next[previous] = following
+        if self._tails[user] == record:
+            self._tails[user] = previous
+
+        self._users[record] = RECORD_NONE
+        self._next[record] = self._free
+        self._free = record
+        self._count -= 1
+        self._counts.remove(self._deadlines[record])
+        return self.user_ids[user], self._deadlines[record]
+
+    def user_sessions(self, user_id: str) -> list:
+        """
+        Session ids of a user, oldest first.
+        """
+        number = self._user_numbers.get(user_id)
+        session_ids = []
+        if number is None:
+            return session_ids
+        record, keys = self._heads[number], self._keys
+        while record != RECORD_NONE:
+            session_ids.append(
+                session_id_of(keys[record << 4:(record + 1) << 4]))
+            record = self._next[record]
+        return session_ids
+
+    def counts(self, now: int) -> tuple:
+        """
+        Number of (active, expired) sessions, expired ones having their
+        deadline before `now`.
+        """
+        return self._counts.counts(now)
+
+    def sweep(self, now: int, steps: int = None) -> int:
+        """
+        Remove the sessions whose deadline is before `now` among the next
+        `steps` records, going round the table (all of them by default),
+        return how many.
+        """
+        total = len(self._users)
+        if steps is None or steps > total:
+            steps = total
+        users, deadlines, keys = self._users, self._deadlines, self._keys
+        hand, removed = self._hand, 0
+        for _ in range(steps):
+            if hand >= total:
+                hand = 0
+            if users[hand] >= 0 and 0 < deadlines[hand] < now:
+                self._remove(*self._find(keys[hand << 4:(hand + 1) << 4]))
+                removed += 1
+            hand += 1
+        self._hand = hand
+        return removed
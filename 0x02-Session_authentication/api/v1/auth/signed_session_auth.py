@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+"""Stateless session authentication with signed cookies"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+import uuid
+from models.bloom_filter import BloomFilter
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_backend import session_backend_from_env
+
+
+def _revocation_key(kind: str, value: str) -> str:
+    """Session id under which the backend keeps a revocation"""
+    digest = hashlib.sha256("{}\0{}".format(kind, value).encode()).digest()
+    return str(uuid.UUID(bytes=digest[:16]))
+
+
+class SignedSessionAuth(SessionAuth):
+    """Session authentication without server-side sessions
+
+    The session cookie is `<user_id>.<issued at>.<expires at>.<nonce>.
+    <key id>.<signature>`, the signature being an HMAC-SHA256 of the rest:
+    checking it needs no session store, so every worker accepts the
+    sessions of the others. Sessions are issued at UTC milliseconds and
+    expire at UTC seconds; the random nonce tells apart the sessions
+    issued to a user at the same time.
+
+    SESSION_KEYS lists the signing keys as `<key id>:<secret>`, comma
+    separated: new sessions are signed with the first one and any listed
+    key is accepted, so a key is rotated by putting a new one first and
+    dropping the old one after SESSION_DURATION. Without SESSION_KEYS a
+    random key is drawn, valid for this process only.
+
+    Revocations are kept by `backend`, chosen by SESSION_BACKEND, under
+    UUIDs derived from what they revoke: a logged out session until it
+    expires, and for each user who logged out everywhere the time it did,
+    the sessions issued until then being revoked. With `sqlite` or
+    `socket`, a revocation applies to every worker; a session server
+    shared with signed sessions must run without SESSION_MAX_PER_USER,
+    which would drop revocations.
+
+    A Bloom filter of the revocation keys lets the sessions that were
+    never revoked through without asking the backend. It is filled with
+    the revocations of this process as they are made and, with a backend
+    shared by other processes, listed again from it every
+    SESSION_REVOCATION_SYNC seconds (1 by default): a revocation made on
+    another worker applies here within that time.
+    """
+
+    def __init__(self):
+        """
+        Initialize the session duration and the keys from environment
+        variables
+        """
+        try:
+            self.session_duration = int(os.getenv('SESSION_DURATION', '0'))
+        except ValueError:
+            self.session_duration = 0
+        try:
+            self.revocation_sync = float(
+                os.getenv('SESSION_REVOCATION_SYNC', '1'))
+        except ValueError:
+            self.revocation_sync = 1.0
+
+        self.keys = {}
+        for key in os.getenv('SESSION_KEYS', '').split(','):
+            if ':' in key:
+                key_id, secret = key.split(':', 1)
+                if key_id and '.' not in key_id:
+                    self.keys.setdefault(key_id, secret.encode())
+        if not self.keys:
+            self.keys['0'] = os.urandom(32)
+        self.key_id = next(iter(self.keys))
+        self.backend = session_backend_from_env(compact=True)
+        self._revoked = None
+        self._synced_at = 0.0
+        self._revoked_lock = threading.Lock()
+
+    def _revocations(self) -> BloomFilter:
+        """
+        Filter of the revocation keys, listed from the backend on first
+        use and again once `revocation_sync` seconds passed if shared;
+        meanwhile the other threads keep using the previous filter
+        """
+        revoked = self._revoked
+        if revoked is not None and (
+                not self.backend.shared or
+                time.monotonic() < self._synced_at + self.revocation_sync):
+            return revoked
+        if not self._revoked_lock.acquire(blocking=revoked is None):
+            return revoked
+        try:
+            if self._revoked is not revoked:
+                return self._revoked
+            keys = self.backend.session_ids()
+            revoked = BloomFilter(max(1024, 2 * len(keys)))
+            for key in keys:
+                revoked.add(key)
+            self._revoked, self._synced_at = revoked, time.monotonic()
+            return revoked
+        finally:
+            self._revoked_lock.release()
+
+    def _revoke(self, key: str, user_id: str, deadline: int):
+        """
+        Keep a revocation in the backend and the filter, the filter being
+        listed again once full
+        """
+        with self._revoked_lock:
+            self.backend.create(key, user_id, deadline)
+            revoked = self._revoked
+            if revoked is not None:
+                revoked.add(key)
+                if revoked.count > revoked.capacity:
+                    self._revoked = None
+
+    def _revoked_at(self, kind: str, value: str) -> tuple:
+        """
+        Backend entry of a revocation, None when the filter rules it out
+        """
+        key = _revocation_key(kind, value)
+        if key not in self._revocations():
+            return None
+        return self.backend.get(key)
+
+    def _sign(self, payload: str, key: bytes) -> str:
+        """
+        Signature of a cookie payload with a key
+        """
+        digest = hmac.new(key, payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+    def create_session(self, user_id: str = None) -> str:
+        """
+        Create a signed session cookie value for a user
+        """
+        if user_id is None or not isinstance(user_id, str):
+            return None
+
+        now = time.time()
+        issued_at = int(now * 1000)
+        revoked = self._revoked_at('user', user_id)
+        if revoked is not None and issued_at <= revoked[1]:
+            issued_at = revoked[1] + 1
+        expires_at = 0
+        if self.session_duration > 0:
+            expires_at = int(now) + self.session_duration
+        nonce = base64.urlsafe_b64encode(os.urandom(12)).decode()
+        payload = "{}.{}.{}.{}.{}".format(user_id, issued_at, expires_at,
+                                          nonce, self.key_id)
+        return "{}.{}".format(payload,
+                              self._sign(payload, self.keys[self.key_id]))
+
+    def _verify(self, session_id: str) -> tuple:
+        """
+        Check the signature, expiry and revocation of a session cookie
+        value, return its (user_id, issued at, expires at, signature) or
+        None
+        """
+        if not session_id or not isinstance(session_id, str):
+            return None
+        parts = session_id.rsplit('.', 5)
+        if len(parts) != 6:
+            return None
+        user_id, issued_at, expires_at, _, key_id, signature = parts
+        key = self.keys.get(key_id)
+        if key is None:
+            return None
+        payload = session_id[:-len(signature) - 1]
+        if not hmac.compare_digest(self._sign(payload, key), signature):
+            return None
+        try:
+            issued_at, expires_at = int(issued_at), int(expires_at)
+        except ValueError:
+            return None
+        if 0 < expires_at < int(time.time()):
+            return None
+        keys = [_revocation_key('user', user_id),
+                _revocation_key('session', signature)]
+        revoked = self._revocations()
+        if keys[0] not in revoked and keys[1] not in revoked:
+            return user_id, issued_at, expires_at, signature
+        user_revoked, session_revoked = self.backend.get_many(keys)
+        if session_revoked is not None or \
+                (user_revoked is not None and issued_at <= user_revoked[1]):
+            return None
+        return user_id, issued_at, expires_at, signature
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """
+        Return the user ID of a valid session cookie value
+        """
+        session = self._verify(session_id)
+        if session is None:
+            return None
+        return session[0]
+
+    def destroy_session(self, request=None):
+        """
+        Revoke the session of a request until it expires
+        """
+        if request is None:
+            return False
+
+        session = self._verify(self.session_cookie(request))
+        if session is None:
+            return False
+
+        user_id, _, expires_at, signature = session
+        self._revoke(_revocation_key('session', signature), user_id,
+                     expires_at)
+        return True
+
+    def destroy_user_sessions(self, user_id: str = None) -> int:
+        """
+        Revoke every session issued to a user so far; their number isn't
+        known, 0 is returned
+        """
+        if not user_id:
+            return 0
+        key = _revocation_key('user', user_id)
+        revoked_at = int(time.time() * 1000)
+        revoked = self.backend.get(key)
+        if revoked is not None:
+            revoked_at = max(revoked_at, revoked[1])
+        # Kept until the user logs out everywhere again: the deadline, in
+        # milliseconds, never passes for the backend
+        self._revoke(key, user_id, revoked_at)
+        return 0
+
+    def session_counts(self) -> tuple:
+        """
+        None: sessions only live in the cookies, the backend only keeps
+        revocations
+        """
+        return None
@@ -8,5 +8,6 @@ app_views = Blueprint("app_views", __name__, url_prefix="/api/v1")
 from api.v1.views.index import *
 from api.v1.views.users import *
 from api.v1.views.session_auth import *
+from models.base import warm_up
 
-User.load_from_file()
+warm_up([User])
@@ -2,6 +2,7 @@
 """ Module of Index views
 """
 from flask import jsonify, abort
+from api.v1.auth.session_backend import SessionBackendError
 from api.v1.views import app_views
 
 
@@ -9,9 +10,24 @@ from api.v1.views import app_views
 def status() -> str:
     """ GET /api/v1/status
     Return:
-      - the status of the API
+      - the status of the API, up as soon as the process serves requests,
+        and whether the store is loaded
     """
-    return jsonify({"status": "OK"})
+    from models.base import READY
+    return jsonify({"status": "OK", "ready": READY.is_set()})
+
+
+@app_views.route('/status/ready', methods=['GET'], strict_slashes=False)
+def ready() -> str:
+    """ GET /api/v1/status/ready
+    Return:
+      - the readiness of the API
+      - 503 while the store is still loading
+    """
+    from models.base import READY
+    if not READY.is_set():
+        return jsonify({"ready": False}), 503
+    return jsonify({"ready": True})
 
 
 @app_views.route('/stats/', strict_slashes=False)
@@ -19,10 +35,30 @@ def stats() -> str:
     """ GET /api/v1/stats
     Return:
       - the number of each objects
+      - for each model class: count, objects in memory, size on disk,
+        ordered index sizes, journal entries and last write latency
+      - the number of active and expired sessions, as kept by the session
+        backend of the auth in use; null when it keeps none or can't be
+        reached
     """
+    from api.v1.app import auth
+    from models.base import CLASSES
     from models.user import User
     stats = {}
     stats['users'] = User.count()
+    stats['models'] = {name: cls.stats()
+                       for name, cls in sorted(CLASSES.items())}
+
+    counts = None
+    if hasattr(auth, 'session_counts'):
+        try:
+            counts = auth.session_counts()
+        except (OSError, SessionBackendError):
+            counts = None
+    stats['sessions'] = None if counts is None else {
+        'active': counts[0],
+        'expired': counts[1],
+    }
     return jsonify(stats)
 
 
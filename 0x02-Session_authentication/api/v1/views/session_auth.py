@@ -59,3 +59,19 @@ def logout():
     if not auth.destroy_session(request):
         abort(404)
     return jsonify({}), 200
+
+
+@app_views.route('/auth_session/logout_all', methods=['DELETE'],
+                 strict_slashes=False)
+def logout_all():
+    """
+    Destroys all the sessions of the current user
+    """
+
+    from api.v1.app import auth
+
+    if request.current_user is None or \
+            not hasattr(auth, 'destroy_user_sessions'):
+        abort(404)
+    count = auth.destroy_user_sessions(request.current_user.id)
+    return jsonify({"sessions": count}), 200
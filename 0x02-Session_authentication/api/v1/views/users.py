@@ -2,18 +2,128 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from datetime import datetime, timezone
+from flask import abort, current_app, jsonify, request
+from itertools import islice
+from urllib.parse import urlencode
 from models.user import User
+import json
+import uuid
+import zlib
+
+
+# (User generation, encoded body) of the last full listing
+_listing = (None, None)
+# Generations are counted per process, listing ETags carry this token too
+_PROCESS_TAG = uuid.uuid4().hex[:8]
+
+
+def _not_modified(etag: str, last_modified: datetime = None):
+    """ Return a 304 response if the client copy matches `etag` or, when
+    it sends no ETag, is not older than `last_modified`; None otherwise
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since:
+        since = request.if_modified_since
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        fresh = last_modified <= since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def _project(user: User, fields: list) -> dict:
+    """ JSON representation of a user, restricted to some fields if given
+    """
+    user_json = user.to_json()
+    if fields is None:
+        return user_json
+    return {k: user_json[k] for k in fields if k in user_json}
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: maximum number of users, in ID order
+      - after: ID of the last user of the previous page
+      - fields: comma-separated list of the fields to return
+      - format: `ndjson` to stream one user per line
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented, with a `Link` header to
+        the next page when limited; the full listing is encoded once per
+        generation of the User store
+      - 304 if the client copy, identified by its ETag, is up to date
+      - 400 if limit isn't a positive integer
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    global _listing
+    generation = User.generation()
+    etag = "{}-{}-{:x}".format(_PROCESS_TAG, generation,
+                               zlib.crc32(request.query_string))
+    response = _not_modified(etag)
+    if response is not None:
+        return response
+
+    fields = request.args.get('fields')
+    if fields is not None:
+        fields = [field for field in fields.split(',') if field]
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    ndjson = request.args.get('format') == 'ndjson'
+
+    if fields is None and limit is None and after is None and not ndjson:
+        cached_generation, body = _listing
+        if cached_generation != generation:
+            all_users = [user.to_json() for user in User.iter_all()]
+            body = jsonify(all_users).get_data()
+            _listing = (generation, body)
+        response = current_app.response_class(body,
+                                              mimetype='application/json')
+        response.set_etag(etag)
+        return response
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({'error': "Wrong format"}), 400
+    if limit is None and after is None:
+        users = User.iter_all()
+    else:
+        users = User.query(between={'id': (after, None)}, order_by='id',
+                           limit=None if limit is None else limit + 1)
+        users = (user for user in users if user.id != after)
+        if limit is not None:
+            users = islice(users, limit)
+
+    if ndjson:
+        def lines():
+            for user in users:
+                yield json.dumps(_project(user, fields)) + "\n"
+        response = current_app.response_class(
+            lines(), mimetype='application/x-ndjson')
+        response.set_etag(etag)
+        return response
+
+    page = list(users)
+    response = jsonify([_project(user, fields) for user in page])
+    response.set_etag(etag)
+    if limit is not None and len(page) == limit:
+        args = request.args.to_dict()
+        args['after'] = page[-1].id
+        response.headers['Link'] = '<{}?{}>; rel="next"'.format(
+            request.base_url, urlencode(args))
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -23,6 +133,8 @@ def view_one_user(user_id: str = None) -> str:
       - User ID
     Return:
       - User object JSON represented
+      - 304 if the client copy, identified by its ETag or date, is up to
+        date
       - 404 if the User ID doesn't exist
     """
     if user_id is None:
@@ -37,7 +149,16 @@ def view_one_user(user_id: str = None) -> str:
         if user is None:
             abort(404)
 
-    return jsonify(user.to_json())
+    # Every save moves updated_at forward, see Base.save_many
+    last_modified = user.updated_at.replace(tzinfo=timezone.utc)
+    etag = "{}-{:x}".format(user.id, int(last_modified.timestamp()))
+    response = _not_modified(etag, last_modified)
+    if response is not None:
+        return response
+    response = jsonify(user.to_json())
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -96,6 +217,74 @@ def create_user() -> str:
     return jsonify({'error': error_msg}), 400
 
 
+@app_views.route('/users/bulk', methods=['POST'], strict_slashes=False)
+def create_users() -> str:
+    """ POST /api/v1/users/bulk
+    JSON body:
+      - list of users, each with the fields of POST /api/v1/users
+    Return:
+      - list with, for each user in the same order, the User object JSON
+        represented or its error
+      - 400 if the body isn't a list or no User could be created
+    """
+    try:
+        rj = request.get_json()
+    except Exception as e:
+        rj = None
+    if type(rj) is not list:
+        return jsonify({'error': "Wrong format"}), 400
+    results = []
+    users = []
+    for item in rj:
+        error_msg = None
+        if type(item) is not dict:
+            error_msg = "Wrong format"
+        if error_msg is None and item.get("email", "") == "":
+            error_msg = "email missing"
+        if error_msg is None and item.get("password", "") == "":
+            error_msg = "password missing"
+        if error_msg is None:
+            try:
+                user = User()
+                user.email = item.get("email")
+                user.password = item.get("password")
+                user.first_name = item.get("first_name")
+                user.last_name = item.get("last_name")
+                users.append(user)
+                results.append(user)
+                continue
+            except Exception as e:
+                error_msg = "Can't create User: {}".format(e)
+        results.append({'error': error_msg})
+    try:
+        User.save_many(users)
+    except Exception as e:
+        return jsonify({'error': "Can't create Users: {}".format(e)}), 400
+    return jsonify([result.to_json() if type(result) is User else result
+                    for result in results]), 201 if users else 400
+
+
+@app_views.route('/users/bulk', methods=['DELETE'], strict_slashes=False)
+def delete_users() -> str:
+    """ DELETE /api/v1/users/bulk
+    JSON body:
+      - list of User IDs
+    Return:
+      - list with, for each ID in the same order, an empty JSON if the
+        User has been deleted or an error if it doesn't exist
+      - 400 if the body isn't a list
+    """
+    try:
+        rj = request.get_json()
+    except Exception as e:
+        rj = None
+    if type(rj) is not list:
+        return jsonify({'error': "Wrong format"}), 400
+    removed = User.remove_many(rj)
+    return jsonify([{} if was_removed else {'error': "Not found"}
+                    for was_removed in removed]), 200
+
+
 @app_views.route('/users/<user_id>', methods=['PUT'], strict_slashes=False)
 def update_user(user_id: str = None) -> str:
     """ PUT /api/v1/users/:id
@@ -1,39 +1,259 @@
 #!/usr/bin/env python3
 """ Base module
 """
-from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from itertools import islice, takewhile
+from os import getenv
+from typing import TypeVar, List, Iterable, Iterator, Callable
+from models.bloom_filter import BloomFilter
+from models.index import ID_MAX, OrderedIndex
+from models.packed import Packer, PackedDict
+from models.store import ShardedStore
+import gc
+import heapq
+import sys
+import threading
+import time
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
 DATA = {}
+LOCKS = {}
+STORES = {}
+TOMBSTONES = {}
+RESIDENT = {}
+INDEXES = {}
+FILTERS = {}
+GENERATIONS = {}
+COUNTS = {}
+LATENCIES = {}
+CLASSES = {}
+COMPACT_MIN = 1024
+SHARDS = int(getenv("MODELS_SHARDS", "1"))
+SHARED = set(filter(None, getenv("MODELS_SHARED", "").split(",")))
+RESIDENT_MAX = int(getenv("MODELS_RESIDENT_MAX", "0"))
+_LOCKS_GUARD = threading.Lock()
+READY = threading.Event()
+
+
+def _class_lock(s_class: str) -> threading.RLock:
+    """ Return the writer lock of a class, creating it on first use
+
+    Writers (save, remove, load/save to file) serialise on this lock.
+    Readers never take it: they work on `list()` snapshots of the class
+    dict, which CPython copies atomically, see `_values`.
+    """
+    lock = LOCKS.get(s_class)
+    if lock is None:
+        with _LOCKS_GUARD:
+            lock = LOCKS.setdefault(s_class, threading.RLock())
+    return lock
+
+
+def _file_store(s_class: str) -> ShardedStore:
+    """ Return the on-disk store of a class, creating it on first use
+    """
+    store = STORES.get(s_class)
+    if store is None:
+        with _LOCKS_GUARD:
+            indexed = getattr(CLASSES.get(s_class), '_indexed', ())
+            shared = s_class in SHARED or RESIDENT_MAX > 0
+            store = STORES.setdefault(s_class,
+                                      ShardedStore(".db_{}".format(s_class),
+                                                   SHARDS, shared, indexed))
+    return store
+
+
+def start_publisher(interval: float) -> threading.Thread:
+    """ Republish the snapshot of every shared class with pending journal
+    entries, every `interval` seconds, from a daemon thread
+    """
+    def publish():
+        while True:
+            time.sleep(interval)
+            for s_class in SHARED:
+                cls = CLASSES.get(s_class)
+                store = STORES.get(s_class)
+                if cls is None or store is None:
+                    continue
+                cls.sync()
+                if store.entries > 0:
+                    cls.save_to_file()
+
+    thread = threading.Thread(target=publish, daemon=True)
+    thread.start()
+    return thread
+
+
+def _values(objs) -> Iterable:
+    """ Objects of a class dict, safe to iterate while it changes: a
+    PackedDict already iterates over a copy of its keys
+    """
+    if type(objs) is dict:
+        return list(objs.values())
+    return objs.values()
+
+
+def warm_up(classes: list) -> threading.Thread:
+    """ Load classes from file from a daemon thread, then freeze the
+    loaded objects out of the garbage collector and set READY. Ordered
+    indexes are left to build on first use, only for the queries that
+    need them.
+    """
+    def load():
+        for cls in classes:
+            cls.load_from_file()
+        gc.collect()
+        gc.freeze()
+        READY.set()
+
+    READY.clear()
+    thread = threading.Thread(target=load, daemon=True)
+    thread.start()
+    return thread
+
+
+def _intern(value):
+    """ Intern a string value, leave anything else untouched
+    """
+    if type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+def _to_timestamp(value) -> int:
+    """ Convert a datetime or a TIMESTAMP_FORMAT string to UTC seconds
+    """
+    if value is None:
+        return int(time.time())
+    if type(value) is int:
+        return value
+    if type(value) is str:
+        value = datetime.fromisoformat(value)
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+def _format_timestamp(timestamp: int) -> str:
+    """ Format UTC seconds with TIMESTAMP_FORMAT
+    """
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(timestamp))
 
 
 class Base():
     """ Base class
+
+    Instances are slotted: timestamps are kept as integer UTC seconds and
+    exposed as naive UTC datetimes through `created_at` and `updated_at`.
+    Subclasses declare their own attributes in `__slots__`; they are
+    collected in `_attrs` and drive `to_json` and `_from_json`.
+
+    Classes listed in the MODELS_SHARED environment variable are served
+    from a memory-mapped snapshot shared by all processes: DATA then only
+    holds the objects written since it was published and TOMBSTONES the
+    ids removed since. `_indexed` attributes get a secondary index in the
+    snapshot, used by `search`.
+
+    With MODELS_RESIDENT_MAX=K every class is served that way and keeps
+    at most K objects in memory: the objects paged in from the snapshot
+    stay in the RESIDENT LRU and written objects are folded back into the
+    snapshot once there are more than K of them. Each fold rewrites the
+    snapshot of every shard written to, so K writes cost one rewrite of
+    those shards: a write costs about N / K object writes for N objects
+    per shard. Raise K or MODELS_SHARDS for write-heavy classes.
+
+    GENERATIONS counts the changes of each class, see `generation`.
+
+    A class with `_packed = True` keeps its objects in DATA as records of
+    a PackedDict (see `models.packed`): about a third of the memory of
+    slotted objects, at the cost of decoding a new object on each access.
+    Changing an object returned by `get` or `search` then has no effect
+    on the stored one until it is saved.
+
+    `_filtered` attributes get a Bloom filter of their values in FILTERS,
+    built on first use: `search` answers a value the filter has never
+    seen without any lookup. Removed values stay in the filter until it
+    is rebuilt, once more values were added than it was sized for.
     """
 
+    __slots__ = ('id', '_created_at', '_updated_at')
+    _attrs = ()
+    _interned = ()
+    _indexed = ()
+    _filtered = ()
+    _packed = False
+    _packer = None
+
+    def __init_subclass__(cls, **kwargs):
+        """ Collect the slotted attributes of a subclass
+        """
+        super().__init_subclass__(**kwargs)
+        CLASSES[cls.__name__] = cls
+        attrs = []
+        for klass in reversed(cls.__mro__):
+            if klass is Base or not issubclass(klass, Base):
+                continue
+            for name in klass.__dict__.get('__slots__', ()):
+                if name not in attrs:
+                    attrs.append(name)
+        cls._attrs = tuple(attrs)
+        cls._packer = Packer(cls) \
+            if cls._packed and cls.__dictoffset__ == 0 else None
+
+    @classmethod
+    def _new_objs(cls):
+        """ Return an empty class dict
+        """
+        if cls._packer is None:
+            return {}
+        return PackedDict(cls._packer)
+
+    @classmethod
+    def _objs(cls):
+        """ Return the class dict, creating it on first use
+        """
+        objs = DATA.get(cls.__name__)
+        if objs is None:
+            objs = DATA.setdefault(cls.__name__, cls._new_objs())
+        return objs
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+        self.__class__._objs()
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
-        if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+        self._created_at = _to_timestamp(kwargs.get('created_at'))
+        if kwargs.get('updated_at') == kwargs.get('created_at'):
+            self._updated_at = self._created_at
         else:
-            self.created_at = datetime.utcnow()
-        if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
-        else:
-            self.updated_at = datetime.utcnow()
+            self._updated_at = _to_timestamp(kwargs.get('updated_at'))
+
+    @property
+    def created_at(self) -> datetime:
+        """ Creation time as a naive UTC datetime
+        """
+        return EPOCH + timedelta(seconds=self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """ Set the creation time
+        """
+        self._created_at = _to_timestamp(value)
+
+    @property
+    def updated_at(self) -> datetime:
+        """ Last update time as a naive UTC datetime
+        """
+        return EPOCH + timedelta(seconds=self._updated_at)
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """ Set the last update time
+        """
+        self._updated_at = _to_timestamp(value)
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -47,8 +267,16 @@ class Base():
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
-        result = {}
-        for key, value in self.__dict__.items():
+        result = {
+            'id': self.id,
+            'created_at': _format_timestamp(self._created_at),
+            'updated_at': _format_timestamp(self._updated_at),
+        }
+        for key in self._attrs:
+            if not for_serialization and key[0] == '_':
+                continue
+            result[key] = getattr(self, key, None)
+        for key, value in getattr(self, '__dict__', {}).items():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -57,56 +285,557 @@ class Base():
                 result[key] = value
         return result
 
+    @classmethod
+    def _from_json(cls, obj_json: dict) -> TypeVar('Base'):
+        """ Build an object from its serialized form without going
+        through `__init__` nor `__setattr__` (bulk loading from disk)
+        """
+        if cls.__dictoffset__ != 0:
+            return cls(**obj_json)
+        obj = cls.__new__(cls)
+        set_slot = object.__setattr__
+        set_slot(obj, 'id', obj_json.get('id'))
+        created_at = _to_timestamp(obj_json.get('created_at'))
+        set_slot(obj, '_created_at', created_at)
+        if obj_json.get('updated_at') == obj_json.get('created_at'):
+            set_slot(obj, '_updated_at', created_at)
+        else:
+            set_slot(obj, '_updated_at',
+                     _to_timestamp(obj_json.get('updated_at')))
+        interned = cls._interned
+        for key in cls._attrs:
+            value = obj_json.get(key)
+            if key in interned:
+                value = _intern(value)
+            set_slot(obj, key, value)
+        return obj
+
+    @classmethod
+    def _fill(cls, objs: dict, tombstones: set, snapshot, objs_json: dict):
+        """ Add loaded JSON objects to a class dict, None marking the ids
+        removed since the shared snapshot
+        """
+        for obj_id, obj_json in objs_json.items():
+            if obj_json is None:
+                if snapshot is not None and obj_id in snapshot:
+                    tombstones.add(obj_id)
+            elif type(objs) is PackedDict:
+                created_at = _to_timestamp(obj_json.get('created_at'))
+                updated_at = created_at \
+                    if obj_json.get('updated_at') == obj_json.get(
+                        'created_at') \
+                    else _to_timestamp(obj_json.get('updated_at'))
+                objs.set_json(obj_json.get('id'), created_at, updated_at,
+                              obj_json)
+            else:
+                obj = cls._from_json(obj_json)
+                objs[obj.id] = obj
+
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        with _class_lock(s_class):
+            store = _file_store(s_class)
+            objs = cls._new_objs()
+            tombstones = set()
+            for shard, objs_json in zip(store.shards, store.load()):
+                cls._fill(objs, tombstones, shard.snapshot, objs_json)
+            DATA[s_class] = objs
+            TOMBSTONES[s_class] = tombstones
+            INDEXES.pop(s_class, None)
+            FILTERS.pop(s_class, None)
+            cls._bump()
+            cls._recount()
+
+    @classmethod
+    def _recount(cls):
+        """ Recompute the object count of the class, must be called under
+        the class lock
+        """
+        s_class = cls.__name__
+        objs = DATA[s_class]
+        snapshot = _file_store(s_class).snapshot
+        if snapshot is None:
+            COUNTS[s_class] = len(objs)
             return
+        added = sum(1 for obj_id in list(objs) if obj_id not in snapshot)
+        COUNTS[s_class] = len(snapshot) - len(TOMBSTONES[s_class]) + added
+
+    @classmethod
+    def _drop_shard(cls, store: ShardedStore, index: int,
+                    objs_json: dict = None):
+        """ Replace the objects and tombstones of one shard by the ones of
+        `objs_json` (none by default), must be called under the class lock
+
+        New class dicts are built aside and swapped in, so that readers,
+        who don't take the lock, see either the old shard or the new one.
+        """
+        s_class = cls.__name__
+        objs = cls._objs()
+        tombstones = TOMBSTONES.get(s_class, set())
+        resident = RESIDENT.get(s_class, OrderedDict())
+        if len(store.shards) == 1:
+            new_objs, new_tombstones = cls._new_objs(), set()
+            new_resident = OrderedDict()
+        else:
+            def kept(obj_id):
+                return store.index(obj_id) != index
+            if type(objs) is PackedDict:
+                new_objs = objs.where(kept)
+            else:
+                new_objs = {obj_id: obj for obj_id, obj in list(objs.items())
+                            if kept(obj_id)}
+            new_tombstones = {obj_id for obj_id in list(tombstones)
+                              if kept(obj_id)}
+            new_resident = OrderedDict(
+                (obj_id, obj) for obj_id, obj in list(resident.items())
+                if kept(obj_id))
+        if objs_json is not None:
+            cls._fill(new_objs, new_tombstones, store.shards[index].snapshot,
+                      objs_json)
+        RESIDENT[s_class] = new_resident
+        TOMBSTONES[s_class] = new_tombstones
+        DATA[s_class] = new_objs
+        INDEXES.pop(s_class, None)
+        FILTERS.pop(s_class, None)
+        cls._bump()
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def _apply_changes(cls, store: ShardedStore, indexes: list = None):
+        """ Apply the journal records written by other processes to some
+        shards (all by default), must be called under the class lock
+        """
+        if indexes is None:
+            indexes = range(len(store.shards))
+        for index in indexes:
+            shard = store.shards[index]
+            records = shard.changes()
+            if records is None:
+                cls._drop_shard(store, index, shard.load())
+                cls._recount()
+                continue
+            for obj_id, obj_json in records:
+                if obj_json is None:
+                    cls._discard(obj_id)
+                else:
+                    cls._keep(cls._from_json(obj_json))
+
+    @classmethod
+    def _bump(cls):
+        """ Count a change of the class, must be called under the class
+        lock
+        """
+        s_class = cls.__name__
+        GENERATIONS[s_class] = GENERATIONS.get(s_class, 0) + 1
+
+    @classmethod
+    def generation(cls) -> int:
+        """ Return a number that changes whenever an object of the class
+        is saved, removed or reloaded in this process
+        """
+        cls.sync()
+        return GENERATIONS.get(cls.__name__, 0)
+
+    @classmethod
+    def _keep(cls, obj: TypeVar('Base')):
+        """ Put an object in the store, must be called under the class lock
+        """
+        cls._keep_many([obj])
+
+    @classmethod
+    def _keep_many(cls, objs: List[TypeVar('Base')]):
+        """ Put objects in the store, updating each ordered index once,
+        must be called under the class lock
+        """
+        s_class = cls.__name__
+        data = cls._objs()
+        tombstones = TOMBSTONES.setdefault(s_class, set())
+        resident = RESIDENT.setdefault(s_class, OrderedDict())
+        store = _file_store(s_class)
+        added = 0
+        for obj in objs:
+            if obj.id not in data:
+                snapshot = store.shard(obj.id).snapshot
+                if snapshot is None or obj.id in tombstones or \
+                        obj.id not in snapshot:
+                    added += 1
+            data[obj.id] = obj
+            tombstones.discard(obj.id)
+            resident.pop(obj.id, None)
+        for index in INDEXES.get(s_class, {}).values():
+            index.add_many(objs)
+        filters = FILTERS.get(s_class, {})
+        for attr, bloom in list(filters.items()):
+            for obj in objs:
+                value = getattr(obj, attr, None)
+                if type(value) is str:
+                    bloom.add(value)
+            if bloom.count > bloom.capacity:
+                del filters[attr]
+        COUNTS[s_class] = COUNTS.get(s_class, 0) + added
+        cls._bump()
+
+    @classmethod
+    def _discard(cls, obj_id: str) -> bool:
+        """ Drop an object from the store, must be called under the class
+        lock. Return False if it wasn't there.
+        """
+        return cls._discard_many([obj_id])[0]
+
+    @classmethod
+    def _discard_many(cls, obj_ids: List[str]) -> List[bool]:
+        """ Drop objects from the store, updating each ordered index once,
+        must be called under the class lock. Return for each id whether it
+        was there.
+        """
+        s_class = cls.__name__
+        data = cls._objs()
+        tombstones = TOMBSTONES.setdefault(s_class, set())
+        resident = RESIDENT.setdefault(s_class, OrderedDict())
+        store = _file_store(s_class)
+        found = []
+        for obj_id in obj_ids:
+            was_there = data.pop(obj_id, None) is not None
+            resident.pop(obj_id, None)
+            if type(obj_id) is str and obj_id not in tombstones:
+                snapshot = store.shard(obj_id).snapshot
+                if snapshot is not None and obj_id in snapshot:
+                    tombstones.add(obj_id)
+                    was_there = True
+            found.append(was_there)
+        for index in INDEXES.get(s_class, {}).values():
+            index.discard_many(obj_ids)
+        removed = sum(found)
+        if removed:
+            COUNTS[s_class] = COUNTS.get(s_class, 0) - removed
+            cls._bump()
+        return found
+
+    @classmethod
+    def sync(cls, obj_id: str = None):
+        """ Catch up with the changes made by other processes, only to the
+        shard of `obj_id` if given, loading the class on first use
+
+        Costs a look at the mapped generation file when nothing changed.
+        """
+        s_class = cls.__name__
+        store = STORES.get(s_class)
+        if store is None:
+            with _class_lock(s_class):
+                cls._apply_changes(_file_store(s_class))
+            return
+        if type(obj_id) is str:
+            if not store.shard(obj_id).stale():
+                return
+            with _class_lock(s_class):
+                cls._apply_changes(store, [store.index(obj_id)])
+            return
+        if not store.stale():
+            return
+        with _class_lock(s_class):
+            cls._apply_changes(store)
+
+    @classmethod
+    def _make_resident(cls, obj: TypeVar('Base')):
+        """ Add an object paged in from the snapshot to the LRU, evicting
+        the least recently used ones past RESIDENT_MAX
+        """
+        if RESIDENT_MAX <= 0:
+            return
+        s_class = cls.__name__
+        resident = RESIDENT.setdefault(s_class, OrderedDict())
+        resident[obj.id] = obj
+        room = max(RESIDENT_MAX - len(DATA[s_class]), 0)
+        try:
+            while len(resident) > room:
+                resident.popitem(last=False)
+        except KeyError:
+            pass
+
+    @classmethod
+    def _page_in(cls, snapshot, obj_id: str) -> TypeVar('Base'):
+        """ Return a resident object or page it in from the snapshot
+        """
+        resident = RESIDENT.get(cls.__name__)
+        if resident:
+            obj = resident.get(obj_id)
+            if obj is not None:
+                try:
+                    resident.move_to_end(obj_id)
+                except KeyError:
+                    pass
+                return obj
+        obj_json = snapshot.get(obj_id)
+        if obj_json is None:
+            return None
+        obj = cls._from_json(obj_json)
+        cls._make_resident(obj)
+        return obj
+
+    @classmethod
+    def _objects(cls) -> Iterable[TypeVar('Base')]:
+        """ Iterate over all objects, including the ones only present in
+        the shared snapshot
+        """
+        s_class = cls.__name__
+        objs = DATA[s_class]
+        yield from _values(objs)
+        store = STORES.get(s_class)
+        snapshot = store.snapshot if store is not None else None
+        if snapshot is None:
+            return
+        tombstones = TOMBSTONES[s_class]
+        resident = RESIDENT.get(s_class, {})
+        for obj_id, obj_json in snapshot:
+            if obj_id not in objs and obj_id not in tombstones:
+                yield resident.get(obj_id) or cls._from_json(obj_json)
+
+    @classmethod
+    def _by_id(cls, snapshot, low: str = None) -> Iterator[TypeVar('Base')]:
+        """ Iterate over all objects in id order from the first id not
+        lower than `low`: the ids of the snapshot, bisected to `low`,
+        merged with the ids of DATA sorted
+        """
+        s_class = cls.__name__
+        objs = DATA[s_class]
+        tombstones = TOMBSTONES[s_class]
+        resident = RESIDENT.get(s_class, {})
+        changed = sorted(obj_id for obj_id in list(objs)
+                         if type(obj_id) is str and
+                         (low is None or obj_id >= low))
+
+        def from_data():
+            for obj_id in changed:
+                obj = objs.get(obj_id)
+                if obj is not None:
+                    yield obj_id, obj
+
+        def from_snapshot():
+            for obj_id, obj_json in snapshot.items_from(low):
+                if obj_id not in objs and obj_id not in tombstones:
+                    yield obj_id, resident.get(obj_id) or \
+                        cls._from_json(obj_json)
+
+        for _, obj in heapq.merge(from_data(), from_snapshot(),
+                                  key=lambda item: item[0]):
+            yield obj
+
+    @classmethod
+    def _candidates(cls, attributes: dict) -> Iterable[TypeVar('Base')]:
+        """ Iterate over the objects that may match some attributes: the
+        ones an ordered or snapshot index points to when it covers one of
+        them, all objects otherwise
+        """
+        s_class = cls.__name__
+        snapshot = STORES[s_class].snapshot
+        for attr in cls._indexed:
+            value = attributes.get(attr)
+            if type(value) is not str:
+                continue
+            index = cls._ordered_index(attr) if snapshot is None else None
+            if index is not None:
+                objs = DATA[s_class]
+                for obj_id in list(index.ids((True, value), (True, value))):
+                    obj = objs.get(obj_id)
+                    if obj is not None:
+                        yield obj
+                return
+            if snapshot is None or not snapshot.indexed(attr):
+                continue
+            objs = DATA[s_class]
+            tombstones = TOMBSTONES[s_class]
+            yield from _values(objs)
+            for obj_id in list(snapshot.lookup(attr, attributes[attr])):
+                if obj_id not in objs and obj_id not in tombstones:
+                    obj = cls._page_in(snapshot, obj_id)
+                    if obj is not None:
+                        yield obj
+            return
+        yield from cls._objects()
+
+    @classmethod
+    def _compact(cls, store: ShardedStore, index: int):
+        """ Fold the journal of a shard into a new snapshot, must be called
+        under both the class lock and the shard lock
+        """
+        s_class = cls.__name__
+        shard = store.shards[index]
+        objs = DATA[s_class]
+        objs_json = {}
+        for obj in _values(objs):
+            if store.index(obj.id) == index:
+                objs_json[obj.id] = obj.to_json(True)
+        if shard.snapshot is not None:
+            tombstones = TOMBSTONES[s_class]
+            for obj_id, obj_json in shard.snapshot:
+                if obj_id not in objs and obj_id not in tombstones:
+                    objs_json[obj_id] = obj_json
+        shard.compact(objs_json)
+        if shard.snapshot is not None:
+            folded = [obj for obj in _values(DATA[s_class])
+                      if store.index(obj.id) == index]
+            cls._drop_shard(store, index)
+            for obj in folded:
+                cls._make_resident(obj)
+            cls._recount()
+
+    @classmethod
+    def _evict(cls, store: ShardedStore):
+        """ Fold the written and removed objects back into the snapshot of
+        their shard once there are more than RESIDENT_MAX of them, must be
+        called under the class lock and no shard lock
+        """
+        if RESIDENT_MAX <= 0:
+            return
+        s_class = cls.__name__
+        if len(DATA[s_class]) + len(TOMBSTONES[s_class]) <= RESIDENT_MAX:
+            return
+        written = list(DATA[s_class]) + list(TOMBSTONES[s_class])
+        for index in sorted(set(store.index(obj_id) for obj_id in written)):
+            with store.shards[index].lock():
+                cls._apply_changes(store, [index])
+                cls._compact(store, index)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        store = _file_store(s_class)
+        with _class_lock(s_class):
+            for index, shard in enumerate(store.shards):
+                with shard.lock():
+                    cls._apply_changes(store, [index])
+                    started = time.monotonic()
+                    cls._compact(store, index)
+                    LATENCIES[s_class] = time.monotonic() - started
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def _compact_if_due(cls, store: ShardedStore, index: int):
+        """ Compact a shard once its journal outgrows its objects, must be
+        called under both the class lock and the shard lock
+        """
+        shard = store.shards[index]
+        size = len(DATA[cls.__name__]) // len(store.shards)
+        if shard.snapshot is not None:
+            size += len(shard.snapshot)
+        if shard.entries > max(COMPACT_MIN, size):
+            cls._compact(store, index)
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__.save_many([self])
+
+    @classmethod
+    def save_many(cls, objs: Iterable[TypeVar('Base')]):
+        """ Save several objects with a single journal write per shard
+
+        `updated_at` is set to now, or one second past the stored one when
+        that isn't later, so that the id and `updated_at` of an object
+        identify its content, even across saves within one second.
+        """
+        s_class = cls.__name__
+        store = _file_store(s_class)
+        by_shard = {}
+        for obj in objs:
+            by_shard.setdefault(store.index(obj.id), []).append(obj)
+        with _class_lock(s_class):
+            for index in sorted(by_shard):
+                shard_objs = by_shard[index]
+                shard = store.shards[index]
+                with shard.lock():
+                    cls._apply_changes(store, [index])
+                    updated_at = int(time.time())
+                    data = DATA[s_class]
+                    for obj in shard_objs:
+                        stored = data.get(obj.id)
+                        obj._updated_at = updated_at if stored is None \
+                            else max(updated_at, stored._updated_at + 1)
+                    cls._keep_many(shard_objs)
+                    started = time.monotonic()
+                    shard.append([[obj.id, obj.to_json(True)]
+                                  for obj in shard_objs])
+                    cls._compact_if_due(store, index)
+                    LATENCIES[s_class] = time.monotonic() - started
+            cls._evict(store)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        self.__class__.remove_many([self.id])
+
+    @classmethod
+    def remove_many(cls, ids: Iterable[str]) -> List[bool]:
+        """ Remove several objects by ID with a single journal write per
+        shard, return for each ID whether it was removed
+        """
+        s_class = cls.__name__
+        store = _file_store(s_class)
+        ids = list(ids)
+        removed = [False] * len(ids)
+        by_shard = {}
+        for position, obj_id in enumerate(ids):
+            if type(obj_id) is str:
+                by_shard.setdefault(store.index(obj_id), []).append(position)
+        with _class_lock(s_class):
+            for index in sorted(by_shard):
+                positions = by_shard[index]
+                shard = store.shards[index]
+                with shard.lock():
+                    cls._apply_changes(store, [index])
+                    found = cls._discard_many([ids[p] for p in positions])
+                    records = []
+                    for position, was_there in zip(positions, found):
+                        if was_there:
+                            removed[position] = True
+                            records.append([ids[position], None])
+                    if records:
+                        started = time.monotonic()
+                        shard.append(records)
+                        LATENCIES[s_class] = time.monotonic() - started
+            cls._evict(store)
+        return removed
 
     @classmethod
     def count(cls) -> int:
-        """ Count all objects
+        """ Count all objects, from a counter kept up to date by every
+        change
+        """
+        cls.sync()
+        return COUNTS.get(cls.__name__, 0)
+
+    @classmethod
+    def count_between(cls, attr: str, low=None, high=None) -> int:
+        """ Count the objects whose attribute is within [low, high], None
+        for an open bound, by bisecting its ordered index
+        """
+        cls.sync()
+        index = cls._ordered_index(attr)
+        if index is None:
+            return sum(1 for _ in cls.query(between={attr: (low, high)}))
+        return index.count(cls._bound(attr, low), cls._bound(attr, high))
+
+    @classmethod
+    def stats(cls) -> dict:
+        """ Return operational numbers of the class, none of them needing
+        a scan of the objects
         """
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        cls.sync()
+        store = _file_store(s_class)
+        latency = LATENCIES.get(s_class)
+        return {
+            'count': COUNTS.get(s_class, 0),
+            'in_memory': len(DATA[s_class]) + len(RESIDENT.get(s_class, {})),
+            'disk_bytes': store.disk_size(),
+            'indexes': {attr: len(index) for attr, index
+                        in list(INDEXES.get(s_class, {}).items())},
+            'journal_entries': store.entries,
+            'last_write_ms': None if latency is None else latency * 1000,
+        }
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -114,24 +843,204 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def iter_all(cls) -> Iterator[TypeVar('Base')]:
+        """ Iterate over all objects without building a list
+        """
+        return cls.iter_search()
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        cls.sync(id)
+        obj = DATA[s_class].get(id)
+        if obj is not None or type(id) is not str or \
+                id in TOMBSTONES[s_class]:
+            return obj
+        snapshot = STORES[s_class].shard(id).snapshot
+        if snapshot is None:
+            return None
+        return cls._page_in(snapshot, id)
+
+    @staticmethod
+    def _match(obj: TypeVar('Base'), attributes: dict) -> bool:
+        """ Tell if an object has all the given attribute values
+        """
+        for k, v in attributes.items():
+            if (getattr(obj, k) != v):
+                return False
+        return True
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
+        return list(cls.iter_search(attributes))
+
+    @classmethod
+    def iter_search(cls, attributes: dict = {}) -> Iterator[TypeVar('Base')]:
+        """ Iterate over the objects with matching attributes without
+        building a list
+        """
+        cls.sync()
+        if len(attributes) == 0:
+            return iter(cls._candidates(attributes))
+        if not cls._may_match(attributes):
+            return iter(())
+        return (obj for obj in cls._candidates(attributes)
+                if cls._match(obj, attributes))
+
+    @classmethod
+    def _may_match(cls, attributes: dict) -> bool:
+        """ Return False when the Bloom filter of a `_filtered` attribute
+        has never seen its value
+        """
+        for attr in cls._filtered:
+            value = attributes.get(attr)
+            if type(value) is str and value not in cls._filter(attr):
+                return False
+        return True
+
+    @classmethod
+    def _filter(cls, attr: str) -> BloomFilter:
+        """ Return the Bloom filter of an attribute, building it on first
+        use from the objects, or from the snapshot index of the attribute
+        when there is one, sized for twice their number
+        """
+        s_class = cls.__name__
+        bloom = FILTERS.get(s_class, {}).get(attr)
+        if bloom is not None:
+            return bloom
+        with _class_lock(s_class):
+            bloom = FILTERS.get(s_class, {}).get(attr)
+            if bloom is not None:
+                return bloom
+            snapshot = STORES[s_class].snapshot
+            if snapshot is not None and snapshot.indexed(attr):
+                values = list(snapshot.values(attr))
+                values.extend(getattr(obj, attr, None)
+                              for obj in _values(DATA[s_class]))
+            else:
+                values = [getattr(obj, attr, None) for obj in cls._objects()]
+            values = [value for value in values if type(value) is str]
+            bloom = BloomFilter(max(1024, 2 * len(values)))
+            for value in values:
+                bloom.add(value)
+            FILTERS.setdefault(s_class, {})[attr] = bloom
+            return bloom
+
+    @staticmethod
+    def _sort_key(attr: str) -> Callable:
+        """ Ordering key of an attribute: objects without a value first,
+        timestamps compared as integer seconds
+        """
+        if attr in ('created_at', 'updated_at'):
+            slot = '_' + attr
+            return lambda obj: (True, getattr(obj, slot))
+
+        def key(obj):
+            value = getattr(obj, attr, None)
+            return (value is not None, value)
+        return key
+
+    @staticmethod
+    def _bound(attr: str, value) -> tuple:
+        """ Ordering key of a query bound, None for an open bound
+        """
+        if value is None:
+            return None
+        if attr in ('created_at', 'updated_at'):
+            value = _to_timestamp(value)
+        return (True, value)
+
+    @classmethod
+    def _ordered_index(cls, attr: str) -> OrderedIndex:
+        """ Return the ordered index of an attribute, building it on first
+        use. None when the class is served from a snapshot, DATA then
+        doesn't hold every object.
+        """
         s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
+        if STORES[s_class].snapshot is not None:
+            return None
+        indexes = INDEXES.setdefault(s_class, {})
+        index = indexes.get(attr)
+        if index is None:
+            with _class_lock(s_class):
+                indexes = INDEXES.setdefault(s_class, {})
+                index = indexes.get(attr)
+                if index is None:
+                    index = OrderedIndex(cls._sort_key(attr))
+                    index.build(_values(DATA[s_class]))
+                    indexes[attr] = index
+        return index
+
+    @classmethod
+    def query(cls, attributes: dict = {}, between: dict = {},
+              prefix: dict = {}, order_by: str = None,
+              limit: int = None) -> Iterator[TypeVar('Base')]:
+        """ Iterate lazily over the objects matching a query:
+        - `attributes`: exact values, as for `search`
+        - `between`: {attribute: (low, high)} inclusive bounds, None for
+          an open bound; timestamps may be datetimes or strings
+        - `prefix`: {attribute: start of a string value}
+        - `order_by`: attribute to sort on, '-attribute' for descending
+        - `limit`: maximum number of objects
+
+        The first range or prefix attribute, or the `order_by` one, is
+        walked through an ordered index built on first use and kept up to
+        date by `save` and `remove`. Classes served from a snapshot have
+        no ordered index: in id order, the snapshot is walked from the low
+        bound on, merged with the objects changed since; otherwise they
+        are scanned, keeping only the `limit` first objects when sorting.
+        """
+        cls.sync()
+        ranges = {}
+        for attr, (low, high) in between.items():
+            ranges[attr] = (cls._bound(attr, low), cls._bound(attr, high))
+        for attr, start in prefix.items():
+            ranges[attr] = ((True, start), (True, start + ID_MAX))
+        keys = {attr: cls._sort_key(attr) for attr in ranges}
+
+        def _within(obj):
+            for attr, (low, high) in ranges.items():
+                key = keys[attr](obj)
+                if (low is not None and key < low) or \
+                        (high is not None and key > high):
                     return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+            return cls._match(obj, attributes)
+
+        reverse = order_by is not None and order_by.startswith('-')
+        sort_attr = order_by.lstrip('-') if order_by else None
+        index_attr = sort_attr or next(iter(ranges), None)
+        index = cls._ordered_index(index_attr) if index_attr else None
+        snapshot = STORES[cls.__name__].snapshot if index is None else None
+        if index is not None:
+            objs = DATA[cls.__name__]
+            low, high = ranges.get(index_attr, (None, None))
+            found = (objs.get(obj_id)
+                     for obj_id in index.ids(low, high, reverse))
+            results = (obj for obj in found
+                       if obj is not None and _within(obj))
+        elif snapshot is not None and sort_attr == 'id' and not reverse:
+            low, high = ranges.get('id', (None, None))
+            results = cls._by_id(snapshot, None if low is None else low[1])
+            if high is not None:
+                results = takewhile(lambda obj: obj.id <= high[1], results)
+            results = filter(_within, results)
+        else:
+            results = filter(_within, cls._candidates(attributes))
+            if sort_attr is not None:
+                sort_key = cls._sort_key(sort_attr)
+
+                def key(obj):
+                    return (sort_key(obj), obj.id)
+                if limit is None:
+                    results = iter(sorted(results, key=key, reverse=reverse))
+                else:
+                    pick = heapq.nlargest if reverse else heapq.nsmallest
+                    results = iter(pick(limit, results, key=key))
+        if limit is not None:
+            return islice(results, limit)
+        return results
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+""" Ordered index module
+"""
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Iterable, Iterator
+import threading
+
+
+# Greater than any id, closes the range of entries sharing a key
+ID_MAX = '\U0010ffff'
+# Batches up to this size are inserted one by one, larger ones re-sorted
+BATCH_MIN = 16
+# Entries copied at once by an iteration
+CHUNK = 256
+
+
+class OrderedIndex():
+    """ Sorted (key, id) entries of one attribute of a class
+
+    Keys are `(value is not None, value)` so that objects without a value
+    sort first. Writers change the list in place under the index lock.
+    Iteration copies CHUNK entries at a time under the same lock, and
+    resumes after the last entry it returned: entries inserted or removed
+    meanwhile never make it skip or repeat the others.
+    """
+
+    def __init__(self, key_of: Callable):
+        """ Initialize an empty index, `key_of` gives an object's key
+        """
+        self._key_of = key_of
+        self._entries = []
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """ Number of indexed objects
+        """
+        return len(self._entries)
+
+    def build(self, objs: Iterable):
+        """ Index a set of objects at once
+        """
+        keys = {obj.id: self._key_of(obj) for obj in objs}
+        entries = sorted((key, obj_id) for obj_id, key in keys.items())
+        with self._lock:
+            self._keys, self._entries = keys, entries
+
+    def discard(self, obj_id: str):
+        """ Remove an object from the index
+        """
+        with self._lock:
+            self._discard(obj_id)
+
+    def _discard(self, obj_id: str):
+        """ Remove an object, under the index lock
+        """
+        key = self._keys.pop(obj_id, None)
+        if key is None:
+            return
+        i = bisect_left(self._entries, (key, obj_id))
+        if i < len(self._entries) and self._entries[i] == (key, obj_id):
+            del self._entries[i]
+
+    def add(self, obj):
+        """ Add or move an object in the index
+        """
+        key = self._key_of(obj)
+        with self._lock:
+            if self._keys.get(obj.id) == key:
+                return
+            self._discard(obj.id)
+            self._keys[obj.id] = key
+            insort(self._entries, (key, obj.id))
+
+    def add_many(self, objs: list):
+        """ Add or move several objects, re-sorting the index once for a
+        large batch
+        """
+        if len(objs) < BATCH_MIN:
+            for obj in objs:
+                self.add(obj)
+            return
+        moved = {}
+        for obj in objs:
+            key = self._key_of(obj)
+            if self._keys.get(obj.id) != key:
+                moved[obj.id] = key
+        self._replace(moved)
+
+    def discard_many(self, obj_ids: list):
+        """ Remove several objects, rebuilding the index once for a large
+        batch
+        """
+        if len(obj_ids) < BATCH_MIN:
+            for obj_id in obj_ids:
+                self.discard(obj_id)
+            return
+        self._replace({obj_id: None for obj_id in obj_ids})
+
+    def _replace(self, keys: dict):
+        """ Give new keys to some ids, None removing them, re-sorting the
+        list once
+        """
+        with self._lock:
+            stale = set((self._keys[obj_id], obj_id) for obj_id in keys
+                        if obj_id in self._keys)
+            if len(stale) == 0 and \
+                    all(key is None for key in keys.values()):
+                return
+            entries = [entry for entry in self._entries
+                       if entry not in stale]
+            for obj_id, key in keys.items():
+                if key is None:
+                    self._keys.pop(obj_id, None)
+                else:
+                    self._keys[obj_id] = key
+                    entries.append((key, obj_id))
+            entries.sort()
+            self._entries = entries
+
+    def _range(self, entries: list, lo: tuple, hi: tuple) -> tuple:
+        """ First and past-the-end positions of the keys within [lo, hi]
+        """
+        start = 0 if lo is None else bisect_left(entries, (lo,))
+        end = len(entries) if hi is None else bisect_right(entries,
+                                                           (hi, ID_MAX))
+        return start, max(start, end)
+
+    def count(self, lo: tuple = None, hi: tuple = None) -> int:
+        """ Number of ids whose key is within [lo, hi]
+        """
+        with self._lock:
+            start, end = self._range(self._entries, lo, hi)
+        return end - start
+
+    def ids(self, lo: tuple = None, hi: tuple = None,
+            reverse: bool = False) -> Iterator[str]:
+        """ Iterate over the ids whose key is within [lo, hi], in key order
+        """
+        last = None
+        while True:
+            with self._lock:
+                entries = self._entries
+                start, end = self._range(entries, lo, hi)
+                if last is not None and reverse:
+                    end = min(end, bisect_left(entries, last))
+                elif last is not None:
+                    start = max(start, bisect_right(entries, last))
+                if reverse:
+                    chunk = entries[max(start, end - CHUNK):end]
+                    chunk.reverse()
+                else:
+                    chunk = entries[start:min(end, start + CHUNK)]
+            if not chunk:
+                return
+            for entry in chunk:
+                yield entry[1]
+            last = chunk[-1]
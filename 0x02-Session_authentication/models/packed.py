@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+""" Packed objects module
+
+A class with `_packed = True` keeps its objects in a PackedDict rather
+than a dict of objects: each object is an immutable bytes record keyed by
+the 16 bytes of its UUID, decoded into a new object on every access. A
+record holds the two timestamps, then each attribute as a tagged value:
+UUIDs and lowercase hex strings (password hashes) in binary, `_interned`
+values as a number in a table of the class, other strings in UTF-8 and
+anything else in JSON.
+
+Records are replaced, never changed, so readers see an object either
+before or after a write.
+"""
+from typing import Callable, Iterator
+import json
+import struct
+
+
+TIMESTAMPS = struct.Struct('<qq')
+LENGTH = struct.Struct('<I')
+NONE, STR, LONG_STR, INTERNED, HEX, UUID, JSON = range(7)
+
+
+def _uuid_bytes(value: str) -> bytes:
+    """ 16 bytes of a UUID in canonical form, None for any other string
+    """
+    if len(value) != 36 or value[8] != '-' or value[13] != '-' or \
+            value[18] != '-' or value[23] != '-':
+        return None
+    digits = value.replace('-', '')
+    try:
+        data = bytes.fromhex(digits)
+    except ValueError:
+        return None
+    if len(data) != 16 or data.hex() != digits:
+        return None
+    return data
+
+
+def _uuid_str(data: bytes) -> str:
+    """ Canonical form of the 16 bytes of a UUID
+    """
+    digits = data.hex()
+    return '{}-{}-{}-{}-{}'.format(digits[:8], digits[8:12], digits[12:16],
+                                   digits[16:20], digits[20:])
+
+
+def _hex_bytes(value: str) -> bytes:
+    """ Bytes of a lowercase hex string of up to 255 bytes, None for any
+    other string
+    """
+    if len(value) % 2 or len(value) > 510:
+        return None
+    try:
+        data = bytes.fromhex(value)
+    except ValueError:
+        return None
+    if data.hex() != value:
+        return None
+    return data
+
+
+class Packer():
+    """ Record format of a class
+    """
+
+    def __init__(self, cls: type):
+        """ Initialize the format of the attributes of a class
+        """
+        self.cls = cls
+        self.attrs = cls._attrs
+        self.interned = frozenset(cls._interned)
+        self._strings = []
+        self._numbers = {}
+
+    def _number(self, value: str) -> int:
+        """ Number of an interned string, adding it to the table
+        """
+        number = self._numbers.get(value)
+        if number is None:
+            number = self._numbers.setdefault(value, len(self._strings))
+            if number == len(self._strings):
+                self._strings.append(value)
+        return number
+
+    def pack(self, created_at: int, updated_at: int, values: list) -> bytes:
+        """ Record of timestamps and attribute values, in `attrs` order
+        """
+        out = bytearray(TIMESTAMPS.pack(created_at, updated_at))
+        for attr, value in zip(self.attrs, values):
+            if value is None:
+                out.append(NONE)
+                continue
+            if type(value) is not str:
+                data = json.dumps(value).encode()
+                out.append(JSON)
+                out += LENGTH.pack(len(data))
+                out += data
+                continue
+            if attr in self.interned:
+                out.append(INTERNED)
+                out += LENGTH.pack(self._number(value))
+                continue
+            data = _uuid_bytes(value)
+            if data is not None:
+                out.append(UUID)
+                out += data
+                continue
+            data = _hex_bytes(value)
+            if data is not None:
+                out.append(HEX)
+                out.append(len(data))
+                out += data
+                continue
+            data = value.encode()
+            if len(data) < 256:
+                out.append(STR)
+                out.append(len(data))
+            else:
+                out.append(LONG_STR)
+                out += LENGTH.pack(len(data))
+            out += data
+        return bytes(out)
+
+    def unpack(self, obj_id: str, record: bytes):
+        """ New object of the class from its id and record, without going
+        through `__init__`
+        """
+        obj = self.cls.__new__(self.cls)
+        set_slot = object.__setattr__
+        set_slot(obj, 'id', obj_id)
+        created_at, updated_at = TIMESTAMPS.unpack_from(record)
+        set_slot(obj, '_created_at', created_at)
+        set_slot(obj, '_updated_at', updated_at)
+        offset = TIMESTAMPS.size
+        for attr in self.attrs:
+            tag = record[offset]
+            offset += 1
+            if tag == NONE:
+                value = None
+            elif tag == STR:
+                end = offset + 1 + record[offset]
+                value = record[offset + 1:end].decode()
+                offset = end
+            elif tag == INTERNED:
+                value = self._strings[LENGTH.unpack_from(record, offset)[0]]
+                offset += LENGTH.size
+            elif tag == UUID:
+                value = _uuid_str(record[offset:offset + 16])
+                offset += 16
+            elif tag == HEX:
+                end = offset + 1 + record[offset]
+                value = record[offset + 1:end].hex()
+                offset = end
+            else:
+                length = LENGTH.unpack_from(record, offset)[0]
+                data = record[offset + LENGTH.size:
+                              offset + LENGTH.size + length]
+                offset += LENGTH.size + length
+                value = data.decode() if tag == LONG_STR else \
+                    json.loads(data)
+            set_slot(obj, attr, value)
+        return obj
+
+
+class PackedDict():
+    """ Objects of a packed class by id, as records
+
+    Supports the part of the dict interface the class store uses.
+    Iterations work on a copy of the keys taken when they start, so they
+    can run while the dict changes.
+    """
+
+    def __init__(self, packer: Packer, records: dict = None):
+        """ Initialize the dict, over the given records if any
+        """
+        self.packer = packer
+        self._records = {} if records is None else records
+
+    @staticmethod
+    def _key(obj_id):
+        """ Key of an id: the bytes of a UUID, the id itself otherwise
+        """
+        if type(obj_id) is str:
+            data = _uuid_bytes(obj_id)
+            if data is not None:
+                return data
+        return obj_id
+
+    @staticmethod
+    def _id(key):
+        """ Id of a key
+        """
+        if type(key) is bytes:
+            return _uuid_str(key)
+        return key
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return len(self._records)
+
+    def __contains__(self, obj_id) -> bool:
+        """ Tell if an id is there
+        """
+        return self._key(obj_id) in self._records
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the ids
+        """
+        for key in list(self._records):
+            yield self._id(key)
+
+    def get(self, obj_id, default=None):
+        """ New object of an id, `default` if it isn't there
+        """
+        record = self._records.get(self._key(obj_id))
+        if record is None:
+            return default
+        return self.packer.unpack(obj_id, record)
+
+    def __setitem__(self, obj_id, obj):
+        """ Store an object under its id
+        """
+        values = [getattr(obj, attr, None) for attr in self.packer.attrs]
+        self._records[self._key(obj_id)] = self.packer.pack(
+            obj._created_at, obj._updated_at, values)
+
+    def set_json(self, obj_id, created_at: int, updated_at: int,
+                 obj_json: dict):
+        """ Store an object from its serialized form without building it
+        """
+        values = [obj_json.get(attr) for attr in self.packer.attrs]
+        self._records[self._key(obj_id)] = self.packer.pack(
+            created_at, updated_at, values)
+
+    def pop(self, obj_id, default=None):
+        """ Remove an id, return its object or `default`
+        """
+        record = self._records.pop(self._key(obj_id), None)
+        if record is None:
+            return default
+        return self.packer.unpack(obj_id, record)
+
+    def values(self) -> Iterator:
+        """ Iterate over new objects
+        """
+        for _, obj in self.items():
+            yield obj
+
+    def items(self) -> Iterator[tuple]:
+        """ Iterate over (id, new object) pairs
+        """
+        records, unpack = self._records, self.packer.unpack
+        for key in list(records):
+            record = records.get(key)
+            if record is not None:
+                obj_id = self._id(key)
+                yield obj_id, unpack(obj_id, record)
+
+    def where(self, keep: Callable[[str], bool]) -> 'PackedDict':
+        """ New dict of the records whose id passes `keep`
+        """
+        return PackedDict(self.packer, {
+            key: record for key, record in list(self._records.items())
+            if keep(self._id(key))})
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+""" Reshard module
+
+Offline tool moving the files of a class to another number of shards,
+to run with the API stopped:
+
+    $ python3 -m models.reshard User 1 8
+    $ MODELS_SHARDS=8 python3 -m api.v1.app
+"""
+from os import path
+from models.base import CLASSES, RESIDENT_MAX, SHARED
+from models.store import ShardedStore
+import models.user
+import models.user_session
+import os
+import sys
+
+
+def reshard(s_class: str, old_shards: int, new_shards: int) -> int:
+    """ Rewrite the files of a class from `old_shards` to `new_shards`
+    shards, return the number of objects moved
+    """
+    stem = ".db_{}".format(s_class)
+    old = ShardedStore(stem, old_shards)
+    objs_json = {}
+    for shard_json in old.load():
+        objs_json.update(shard_json)
+
+    shared = s_class in SHARED or RESIDENT_MAX > 0
+    indexed = getattr(CLASSES.get(s_class), '_indexed', ())
+    new = ShardedStore(stem, new_shards, shared, indexed)
+    parts = [{} for _ in new.shards]
+    for obj_id, obj_json in objs_json.items():
+        parts[new.index(obj_id)][obj_id] = obj_json
+    for shard, part in zip(new.shards, parts):
+        with shard.lock():
+            shard.compact(part)
+
+    kept = set()
+    for shard in new.shards:
+        kept.update((shard.file_path, shard.journal_path,
+                     shard.snapshot_path, shard.lock_path))
+    for shard in old.shards:
+        for file_path in (shard.file_path, shard.journal_path,
+                          shard.snapshot_path, shard.lock_path):
+            if file_path not in kept and path.exists(file_path):
+                os.remove(file_path)
+    return len(objs_json)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: {} <class> <old shards> <new shards>"
+              .format(sys.argv[0]))
+        sys.exit(1)
+    count = reshard(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))
+    print("{} objects resharded".format(count))
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+""" Read-only snapshot module
+
+A snapshot (`.db_<Class>.snap`) is a fixed-layout binary image of a class
+that every worker memory-maps read-only, so the pages are shared through
+the OS page cache instead of being copied in each process:
+
+    header  magic, version, count, journal token, offset of the
+            secondary indexes
+    index   `count` entries (id offset, id length, data offset, data
+            length) sorted by id, searched by bisection in place
+    ids     every id, back to back
+    data    the JSON form of every object, back to back
+    indexes for each indexed attribute: its name, entry count, then
+            (value offset, value length, id offset, id length) entries
+            sorted by value, then the values back to back
+
+Entries are fixed-size and point to variable-length strings, so that a
+long id or value only takes its own length. The journal token ties the
+snapshot to the journal started with it, see `models.store`. Only string
+values are indexed.
+"""
+from typing import Callable, Iterator, List, Tuple
+import heapq
+import json
+import mmap
+import os
+import struct
+
+
+MAGIC = b'MSNP'
+VERSION = 3
+HEADER = struct.Struct('<4sIQ16sQ')
+INDEX_HEADER = struct.Struct('<32sQ')
+ENTRY = struct.Struct('<QIQI')
+
+
+def _bisect(count: int, key_at: Callable[[int], bytes], key: bytes) -> int:
+    """ First position whose key isn't lower than `key`
+    """
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key_at(mid) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def write_snapshot(file_path: str, objs_json: dict, journal_token: bytes,
+                   indexed: tuple = ()):
+    """ Write objects, given as JSON dictionaries by id, to a snapshot file
+    with a secondary index on each `indexed` attribute
+    """
+    items = sorted((obj_id.encode(), json.dumps(obj_json).encode())
+                   for obj_id, obj_json in objs_json.items())
+    key_offset = HEADER.size + len(items) * ENTRY.size
+    offset = key_offset + sum(len(key) for key, _ in items)
+    index = bytearray()
+    key_offsets = {}
+    for key, value in items:
+        index += ENTRY.pack(key_offset, len(key), offset, len(value))
+        key_offsets[key] = key_offset
+        key_offset += len(key)
+        offset += len(value)
+
+    with open(file_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(items), journal_token,
+                            offset))
+        f.write(index)
+        for key, _ in items:
+            f.write(key)
+        for _, value in items:
+            f.write(value)
+        f.write(struct.pack('<I', len(indexed)))
+        offset += 4
+        for attr in indexed:
+            pairs = sorted((obj_json[attr].encode(), obj_id.encode())
+                           for obj_id, obj_json in objs_json.items()
+                           if type(obj_json.get(attr)) is str)
+            f.write(INDEX_HEADER.pack(attr.encode(), len(pairs)))
+            value_offset = offset + INDEX_HEADER.size + \
+                len(pairs) * ENTRY.size
+            entries = bytearray()
+            for value, key in pairs:
+                entries += ENTRY.pack(value_offset, len(value),
+                                      key_offsets[key], len(key))
+                value_offset += len(value)
+            f.write(entries)
+            for value, _ in pairs:
+                f.write(value)
+            offset = value_offset
+
+
+class Snapshot():
+    """ Memory-mapped, read-only view of a snapshot file
+    """
+
+    def __init__(self, file_path: str):
+        """ Map a snapshot file, raise ValueError if it isn't one
+        """
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError("{} is not a snapshot".format(file_path))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, journal_token, offset = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a snapshot".format(file_path))
+        self.journal_token = journal_token
+        self._count = count
+
+        # attribute -> (first entry offset, entry count)
+        self._indexes = {}
+        n_indexes, = struct.unpack_from('<I', self._map, offset)
+        offset += 4
+        for _ in range(n_indexes):
+            attr, n_entries = INDEX_HEADER.unpack_from(self._map, offset)
+            offset += INDEX_HEADER.size
+            self._indexes[attr.rstrip(b'\0').decode()] = (offset, n_entries)
+            offset += n_entries * ENTRY.size
+            if n_entries:
+                value_offset, value_length, _, _ = ENTRY.unpack_from(
+                    self._map, offset - ENTRY.size)
+                offset = value_offset + value_length
+
+    def __len__(self) -> int:
+        """ Number of objects in the snapshot
+        """
+        return self._count
+
+    def _entry_at(self, offset: int, i: int) -> tuple:
+        """ Entry number `i` of the table at `offset`: the string it is
+        sorted by, then the offset and length it points to
+        """
+        key_offset, key_length, offset, length = ENTRY.unpack_from(
+            self._map, offset + i * ENTRY.size)
+        return (self._map[key_offset:key_offset + key_length], offset,
+                length)
+
+    def _find(self, obj_id: str) -> tuple:
+        """ Bisect the index for an id, return its entry or None
+        """
+        key = obj_id.encode()
+        lo = _bisect(self._count,
+                     lambda i: self._entry_at(HEADER.size, i)[0], key)
+        if lo < self._count:
+            entry = self._entry_at(HEADER.size, lo)
+            if entry[0] == key:
+                return entry
+        return None
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ Tell if an id is in the snapshot
+        """
+        return type(obj_id) is str and self._find(obj_id) is not None
+
+    def get(self, obj_id: str) -> dict:
+        """ Return the JSON dictionary of an object, None if absent
+        """
+        if type(obj_id) is not str:
+            return None
+        entry = self._find(obj_id)
+        if entry is None:
+            return None
+        _, offset, length = entry
+        return json.loads(self._map[offset:offset + length])
+
+    def __iter__(self) -> Iterator[Tuple[str, dict]]:
+        """ Iterate over (id, JSON dictionary) in id order
+        """
+        return self.items_from()
+
+    def items_from(self, obj_id: str = None) -> Iterator[Tuple[str, dict]]:
+        """ Iterate over (id, JSON dictionary) in id order, from the first
+        id not lower than `obj_id` found by bisection
+        """
+        start = 0
+        if obj_id is not None:
+            start = _bisect(self._count,
+                            lambda i: self._entry_at(HEADER.size, i)[0],
+                            obj_id.encode())
+        for i in range(start, self._count):
+            key, offset, length = self._entry_at(HEADER.size, i)
+            yield (key.decode(),
+                   json.loads(self._map[offset:offset + length]))
+
+    def indexed(self, attr: str) -> bool:
+        """ Tell if the snapshot has a secondary index on an attribute
+        """
+        return attr in self._indexes
+
+    def values(self, attr: str) -> Iterator[str]:
+        """ Iterate over the values of an indexed attribute, in order
+        """
+        start, n_entries = self._indexes[attr]
+        for i in range(n_entries):
+            yield self._entry_at(start, i)[0].decode()
+
+    def lookup(self, attr: str, value: str) -> Iterator[str]:
+        """ Iterate over the ids whose indexed attribute equals `value`
+        """
+        start, n_entries = self._indexes[attr]
+        value = value.encode()
+        i = _bisect(n_entries, lambda i: self._entry_at(start, i)[0], value)
+        while i < n_entries:
+            entry_value, key_offset, key_length = self._entry_at(start, i)
+            if entry_value != value:
+                return
+            yield self._map[key_offset:key_offset + key_length].decode()
+            i += 1
+
+
+class ShardedSnapshot():
+    """ Single view over the snapshots of every shard of a class
+    """
+
+    def __init__(self, snapshots: List[Snapshot],
+                 shard_of: Callable[[str], int]):
+        """ Initialize the view, `shard_of` maps an id to its shard
+        """
+        self._snapshots = snapshots
+        self._shard_of = shard_of
+
+    def __len__(self) -> int:
+        """ Number of objects in all shards
+        """
+        return sum(len(snapshot) for snapshot in self._snapshots)
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ Tell if an id is in its shard snapshot
+        """
+        if type(obj_id) is not str:
+            return False
+        return obj_id in self._snapshots[self._shard_of(obj_id)]
+
+    def get(self, obj_id: str) -> dict:
+        """ Return the JSON dictionary of an object, None if absent
+        """
+        if type(obj_id) is not str:
+            return None
+        return self._snapshots[self._shard_of(obj_id)].get(obj_id)
+
+    def __iter__(self) -> Iterator[Tuple[str, dict]]:
+        """ Iterate over (id, JSON dictionary), shard after shard
+        """
+        for snapshot in self._snapshots:
+            yield from snapshot
+
+    def items_from(self, obj_id: str = None) -> Iterator[Tuple[str, dict]]:
+        """ Iterate over (id, JSON dictionary) in id order, from the first
+        id not lower than `obj_id`, merging the shards
+        """
+        return heapq.merge(*(snapshot.items_from(obj_id)
+                             for snapshot in self._snapshots),
+                           key=lambda item: item[0])
+
+    def indexed(self, attr: str) -> bool:
+        """ Tell if the snapshots have a secondary index on an attribute
+        """
+        return all(snapshot.indexed(attr) for snapshot in self._snapshots)
+
+    def values(self, attr: str) -> Iterator[str]:
+        """ Iterate over the values of an indexed attribute, shard after
+        shard
+        """
+        for snapshot in self._snapshots:
+            yield from snapshot.values(attr)
+
+    def lookup(self, attr: str, value: str) -> Iterator[str]:
+        """ Iterate over the ids whose indexed attribute equals `value`
+        """
+        for snapshot in self._snapshots:
+            yield from snapshot.lookup(attr, value)
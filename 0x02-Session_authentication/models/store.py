@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+""" On-disk store module
+
+A class is persisted as a JSON snapshot (`.db_<Class>.json`, same format
+as before) plus an append-only journal (`.db_<Class>.journal`) holding one
+`[id, object or null]` line per save or remove made since the snapshot.
+
+Processes sharing the files keep an offset into the journal and only read
+what was appended since their last look. Compaction folds the journal into
+a new snapshot and replaces the journal by an empty one: its new token
+tells the other processes they need a full reload.
+
+A shared store also publishes a memory-mapped snapshot (`.db_<Class>.snap`,
+see `models.snapshot`) on compaction, and loads only the journal on top of
+it instead of parsing the JSON snapshot.
+
+A class can be split in N shards by a hash of the object id: each shard is
+a FileStore of its own (`.db_<Class>.<i>.json`, ...), so a write only
+appends to and compacts its own shard.
+
+Every write also bumps the counter of its shard in the generation file of
+the class (`.db_<Class>.gen`), memory-mapped by every process: a process
+tells whether a shard, or any shard, changed since its last look by
+comparing the counters with the ones it last saw, without any system call.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from os import path
+from typing import List
+from models.snapshot import ShardedSnapshot, Snapshot, write_snapshot
+import json
+import mmap
+import os
+import threading
+import uuid
+import zlib
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def shard_of(obj_id: str, shards: int) -> int:
+    """ Shard number of an object id
+    """
+    if shards == 1:
+        return 0
+    return zlib.crc32(obj_id.encode()) % shards
+
+
+class FileStore():
+    """ Snapshot, journal and lock files of one class
+
+    The journal starts with a `{"journal": <token>}` line: a new token is
+    drawn at each compaction, so that a replaced journal is recognised
+    even when the file system hands out the same inode again.
+
+    A FileStore is not thread-safe: callers serialise on the class lock.
+    """
+
+    def __init__(self, stem: str, shared: bool = False,
+                 indexed: tuple = (), generation: tuple = None):
+        """ Initialize the store for files named `<stem>.json` etc., its
+        write counter being at (map, offset) of a generation file if given
+        """
+        self.file_path = "{}.json".format(stem)
+        self.journal_path = "{}.journal".format(stem)
+        self.lock_path = "{}.lock".format(stem)
+        self.snapshot_path = "{}.snap".format(stem)
+        self.shared = shared
+        self.indexed = indexed
+        self.snapshot = None
+        self.entries = 0
+        self._token = None
+        self._ino = None
+        self._mtime = None
+        self._offset = 0
+        self._depth = 0
+        self._generation_map, self._generation_offset = \
+            generation or (None, 0)
+        self._generation_seen = None
+
+    @contextmanager
+    def lock(self, shared: bool = False):
+        """ Hold the inter-process lock of the store, nested calls reuse
+        the lock already held
+        """
+        if self._depth > 0:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+        with open(self.lock_path, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            self._depth = 1
+            try:
+                yield
+            finally:
+                self._depth = 0
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _tmp_path(self, file_path: str) -> str:
+        """ Name of a private file to write aside before renaming
+        """
+        return "{}.{}.{}.tmp".format(file_path, os.getpid(),
+                                     threading.get_ident())
+
+    def _write_atomic(self, file_path: str, data: bytes):
+        """ Write a file aside and rename it in place
+        """
+        tmp_path = self._tmp_path(file_path)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+
+    def _new_journal(self) -> tuple:
+        """ Write an empty journal aside, return its path and token
+        """
+        token = uuid.uuid4().bytes
+        tmp_path = self._tmp_path(self.journal_path)
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps({'journal': token.hex()}).encode() + b'\n')
+        return tmp_path, token
+
+    def _ensure_journal(self):
+        """ Create the journal if there is none yet
+        """
+        if path.exists(self.journal_path):
+            return
+        tmp_path, _ = self._new_journal()
+        try:
+            os.link(tmp_path, self.journal_path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+
+    def _journal_token(self, f) -> bytes:
+        """ Token of an open journal file
+        """
+        f.seek(0)
+        try:
+            return bytes.fromhex(json.loads(f.readline())['journal'])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _read_from(self, f, st: os.stat_result) -> list:
+        """ Read the complete journal lines past the current offset of an
+        open journal file, `st` being its status taken beforehand
+        """
+        f.seek(self._offset)
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        self._offset += end
+        self._ino = st.st_ino
+        self._mtime = st.st_mtime_ns
+        records = []
+        for line in data[:end].splitlines():
+            record = json.loads(line)
+            if type(record) is dict:
+                self._token = bytes.fromhex(record['journal'])
+            else:
+                records.append(record)
+        self.entries += len(records)
+        return records
+
+    def _map_snapshot(self) -> Snapshot:
+        """ Map the published snapshot if it goes with the current journal,
+        None otherwise
+        """
+        self._ensure_journal()
+        try:
+            snapshot = Snapshot(self.snapshot_path)
+        except (OSError, ValueError):
+            return None
+        with open(self.journal_path, 'rb') as f:
+            if snapshot.journal_token != self._journal_token(f):
+                return None
+        return snapshot
+
+    def _read_all(self, snapshot: Snapshot = None) -> dict:
+        """ Read the JSON snapshot, unless `snapshot` is mapped, and the
+        journal
+        """
+        objs_json = {}
+        if snapshot is None and path.exists(self.file_path):
+            with open(self.file_path, 'r') as f:
+                objs_json = json.load(f)
+        self._ensure_journal()
+        self._offset = 0
+        self.entries = 0
+        with open(self.journal_path, 'rb') as f:
+            records = self._read_from(f, os.fstat(f.fileno()))
+        for obj_id, obj_json in records:
+            if obj_json is None and snapshot is None:
+                objs_json.pop(obj_id, None)
+            else:
+                objs_json[obj_id] = obj_json
+        return objs_json
+
+    def disk_size(self) -> int:
+        """ Size in bytes of the snapshot and journal files
+        """
+        size = 0
+        for file_path in (self.file_path, self.journal_path,
+                          self.snapshot_path):
+            try:
+                size += os.stat(file_path).st_size
+            except FileNotFoundError:
+                pass
+        return size
+
+    def load(self) -> dict:
+        """ Read the snapshot and the journal, return objects by id
+
+        A shared store returns only the journal on top of its mapped
+        `snapshot`, objects removed since the snapshot map to None. The
+        first shared load publishes the snapshot if there is none.
+
+        The new snapshot replaces the previous one in a single assignment
+        once mapped: readers of `snapshot` never see it missing.
+        """
+        with self.lock(shared=True):
+            generation = self._generation()
+            snapshot = self._map_snapshot() if self.shared else None
+            if not self.shared or snapshot is not None:
+                objs_json = self._read_all(snapshot)
+                self.snapshot = snapshot
+                self._generation_seen = generation
+                return objs_json
+        with self.lock():
+            snapshot = self._map_snapshot()
+            if snapshot is None:
+                self.compact(self._read_all())
+                snapshot = self.snapshot
+            generation = self._generation()
+            objs_json = self._read_all(snapshot)
+            self.snapshot = snapshot
+            self._generation_seen = generation
+            return objs_json
+
+    def _generation(self) -> bytes:
+        """ Write counter of the store, None without a generation file
+        """
+        if self._generation_map is None:
+            return None
+        offset = self._generation_offset
+        return self._generation_map[offset:offset + 8]
+
+    def _bump(self):
+        """ Count a write to the store, must be called under the exclusive
+        lock, the only one writing the counter
+        """
+        if self._generation_map is None:
+            return
+        count = int.from_bytes(self._generation(), 'little') + 1
+        self._generation_seen = count.to_bytes(8, 'little')
+        offset = self._generation_offset
+        self._generation_map[offset:offset + 8] = self._generation_seen
+
+    def stale(self) -> bool:
+        """ Tell, without reading it, if the journal moved since the last
+        read or write of this process
+        """
+        if self._ino is None:
+            return True
+        if self._generation_seen is not None:
+            return self._generation() != self._generation_seen
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return True
+        return st.st_ino != self._ino or st.st_size != self._offset or \
+            st.st_mtime_ns != self._mtime
+
+    def changes(self):
+        """ Return the journal records written by other processes
+
+        Returns an empty list when nothing changed and None when the
+        journal was compacted and a full `load` is needed.
+        """
+        generation = self._generation()
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            st = os.fstat(f.fileno())
+            if st.st_ino != self._ino or \
+                    self._journal_token(f) != self._token:
+                return None
+            self._generation_seen = generation
+            if st.st_size == self._offset and st.st_mtime_ns == self._mtime:
+                return []
+            return self._read_from(f, st)
+
+    def append(self, records: list):
+        """ Append records to the journal, `changes` must have been
+        applied under the same exclusive lock
+        """
+        data = b''.join(json.dumps(record).encode() + b'\n'
+                        for record in records)
+        with open(self.journal_path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            self._offset = f.tell()
+            self._mtime = os.fstat(f.fileno()).st_mtime_ns
+        self.entries += len(records)
+        self._bump()
+
+    def compact(self, objs_json: dict):
+        """ Write a new snapshot and start an empty journal, must be
+        called under the exclusive lock
+        """
+        journal_tmp, token = self._new_journal()
+        self._write_atomic(self.file_path, json.dumps(objs_json).encode())
+        if self.shared:
+            snapshot_tmp = self._tmp_path(self.snapshot_path)
+            write_snapshot(snapshot_tmp, objs_json, token, self.indexed)
+            os.replace(snapshot_tmp, self.snapshot_path)
+            self.snapshot = Snapshot(self.snapshot_path)
+        os.replace(journal_tmp, self.journal_path)
+        self._offset = 0
+        self.entries = 0
+        with open(self.journal_path, 'rb') as f:
+            self._read_from(f, os.fstat(f.fileno()))
+        self._bump()
+
+
+class ShardedStore():
+    """ The FileStores of every shard of one class
+
+    With a single shard the files keep their unsharded names.
+    """
+
+    def __init__(self, stem: str, shards: int = 1, shared: bool = False,
+                 indexed: tuple = ()):
+        """ Initialize the shards of files named `<stem>.<i>.json` etc.
+        and map the generation file
+        """
+        self.generation_map = self._map_generation(
+            "{}.gen".format(stem), shards)
+        if shards == 1:
+            self.shards = [FileStore(stem, shared, indexed,
+                                     (self.generation_map, 0))]
+        else:
+            self.shards = [FileStore("{}.{}".format(stem, i), shared,
+                                     indexed, (self.generation_map, 8 * i))
+                           for i in range(shards)]
+
+    @staticmethod
+    def _map_generation(file_path: str, shards: int) -> mmap.mmap:
+        """ Map a generation file of a counter per shard, creating or
+        growing it if needed
+        """
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < 8 * shards:
+                os.ftruncate(fd, 8 * shards)
+            return mmap.mmap(fd, 8 * shards)
+        finally:
+            os.close(fd)
+
+    def index(self, obj_id: str) -> int:
+        """ Shard number of an object id
+        """
+        return shard_of(obj_id, len(self.shards))
+
+    def shard(self, obj_id: str) -> FileStore:
+        """ Shard of an object id
+        """
+        return self.shards[self.index(obj_id)]
+
+    @property
+    def snapshot(self):
+        """ View over the mapped snapshots, None unless all are mapped
+        """
+        if len(self.shards) == 1:
+            return self.shards[0].snapshot
+        snapshots = [shard.snapshot for shard in self.shards]
+        if None in snapshots:
+            return None
+        return ShardedSnapshot(snapshots, self.index)
+
+    @property
+    def entries(self) -> int:
+        """ Journal entries since the last compaction of each shard
+        """
+        return sum(shard.entries for shard in self.shards)
+
+    def disk_size(self) -> int:
+        """ Size in bytes of the files of every shard
+        """
+        return sum(shard.disk_size() for shard in self.shards)
+
+    def stale(self) -> bool:
+        """ Tell if any shard journal moved
+        """
+        for shard in self.shards:
+            if shard.stale():
+                return True
+        return False
+
+    def load(self) -> List[dict]:
+        """ Load every shard, reading them from parallel threads
+        """
+        if len(self.shards) == 1:
+            return [self.shards[0].load()]
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as executor:
+            return list(executor.map(FileStore.load, self.shards))
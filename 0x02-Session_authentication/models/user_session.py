@@ -2,13 +2,20 @@
 
 """Manage user sessions"""
 
-from models.base import Base
+from models.base import Base, _intern
 
 
 class UserSession(Base):
     """UserSession class to manage user sessions"""
+
+    __slots__ = ('user_id', 'session_id')
+    _indexed = ('session_id', 'user_id')
+    _filtered = ('session_id',)
+    _interned = ('user_id',)
+    _packed = True
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize UserSession instance """
         super().__init__(*args, **kwargs)
-        self.user_id = kwargs.get('user_id')
+        self.user_id = _intern(kwargs.get('user_id'))
         self.session_id = kwargs.get('session_id')
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+""" Main 10: indexed searches and queries while other threads write
+"""
+import sys
+import threading
+from models.user import User
+
+ROUNDS = 5000
+done = threading.Event()
+
+
+def writer():
+    """ save and remove users sorting before the searched one """
+    i = 0
+    while not done.is_set():
+        user = User()
+        user.email = "b{:07d}@hbtn.io".format(i)
+        user.save()
+        user.remove()
+        i += 1
+
+
+User.load_from_file()
+users = []
+for i in range(1000):
+    user = User()
+    user.email = "a{:05d}@hbtn.io".format(i)
+    users.append(user)
+User.save_many(users)
+target = User()
+target.email = "zzz@hbtn.io"
+target.save()
+
+# Switch threads as often as possible to surface races
+sys.setswitchinterval(1e-6)
+thread = threading.Thread(target=writer)
+thread.start()
+missed = sum(1 for _ in range(ROUNDS)
+             if not User.search({'email': target.email}))
+listed = [user.email for user in User.query(prefix={'email': 'a'},
+                                            order_by='email')]
+done.set()
+thread.join()
+
+print("Missed searches: {}".format(missed))
+print("Listed in order: {}".format(
+    listed == sorted(user.email for user in users)))
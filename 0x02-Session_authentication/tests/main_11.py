@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+""" Main 11: packed User records - roundtrip and memory per user
+"""
+import gc
+import tracemalloc
+import uuid
+from models.base import DATA
+from models.user import User
+
+N = 20000
+
+user = User()
+user.email = "bob@hbtn.io"
+user.password = "H0lbertonSchool98!"
+user.first_name = "Bob"
+user.save()
+print("Packed: {}".format(type(DATA['User']).__name__))
+print("Get: {}".format(User.get(user.id).to_json() == user.to_json()))
+print("Search: {}".format(
+    [u.id for u in User.search({'email': "bob@hbtn.io"})] == [user.id]))
+print("Password: {}".format(
+    User.get(user.id).is_valid_password("H0lbertonSchool98!")))
+
+user.last_name = "Dylan"
+user.save()
+print("Updated: {}".format(User.get(user.id).display_name()))
+User.load_from_file()
+print("Reloaded: {}".format(User.get(user.id).to_json() == user.to_json()))
+user.remove()
+print("Removed: {} {}".format(User.get(user.id), User.count()))
+
+# Records of users with a uuid id, a password hash and shared names
+names = ["Bob", "Alice", "Carol", "Dan", "Eve"]
+gc.collect()
+tracemalloc.start()
+users = []
+for i in range(N):
+    u = User(id=str(uuid.uuid4()), email="user{}@hbtn.io".format(i),
+             first_name=names[i % 5], last_name=names[(i + 2) % 5])
+    u.password = str(i)
+    users.append(u)
+for u in users:
+    DATA['User'][u.id] = u
+del users, u
+gc.collect()
+per_user = tracemalloc.get_traced_memory()[0] / N
+tracemalloc.stop()
+print("Under 237 bytes per user: {}".format(per_user < 237))
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+""" Main 12: conditional GET of a user, answered with 304 when unchanged
+"""
+import importlib
+import os
+
+os.environ['AUTH_TYPE'] = ""
+
+# The app reads its settings on import
+app = importlib.import_module('api.v1.app').app
+User = importlib.import_module('models.user').User
+
+user = User()
+user.email = "bob@hbtn.io"
+user.first_name = "Bob"
+user.save()
+client = app.test_client()
+path = "/api/v1/users/{}".format(user.id)
+
+response = client.get(path)
+etag, last_modified = response.headers['ETag'], \
+    response.headers['Last-Modified']
+print("First GET: {}".format(response.status_code))
+response = client.get(path, headers={'If-None-Match': etag})
+print("Same ETag: {} {}".format(response.status_code,
+                                len(response.get_data())))
+response = client.get(path, headers={'If-Modified-Since': last_modified})
+print("Not modified since: {}".format(response.status_code))
+
+# Saved again within the same second
+user.first_name = "Robert"
+user.save()
+response = client.get(path, headers={'If-None-Match': etag})
+print("After a save: {} {}".format(response.status_code,
+                                   response.get_json()['first_name']))
+print("New ETag: {}".format(response.headers['ETag'] != etag))
+response = client.get(path, headers={'If-None-Match':
+                                     response.headers['ETag']})
+print("New ETag matches: {}".format(response.status_code))
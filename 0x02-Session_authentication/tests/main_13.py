@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+""" Main 13: every session backend through the same calls
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from api.v1.auth.session_backend import CompactMemoryBackend, \
+    MemoryBackend, SQLiteBackend, SocketBackend
+from api.v1.auth.session_db_auth import UserSessionBackend
+from api.v1.auth.session_server import serve
+
+server = CompactMemoryBackend(max_per_user=2)
+threading.Thread(target=asyncio.run, args=(serve(".sessions.sock", server),),
+                 daemon=True).start()
+while not os.path.exists(".sessions.sock"):
+    time.sleep(0.01)
+
+backends = [MemoryBackend(max_per_user=2),
+            CompactMemoryBackend(max_per_user=2),
+            SQLiteBackend(".sessions.db", 2),
+            SocketBackend(".sessions.sock", 2),
+            UserSessionBackend(60, 2)]
+deadline = int(time.time()) + 60
+for backend in backends:
+    ids = [str(uuid.uuid4()) for _ in range(4)]
+    for session_id, user_id in zip(ids, ["alice"] * 3 + ["bob"]):
+        backend.create(session_id, user_id, deadline)
+    users = [session[0] if session else None
+             for session in backend.get_many(ids)]
+    deleted = [backend.delete(ids[1]), backend.delete(ids[1])]
+    counts = backend.count()
+    logged_out = backend.delete_user("alice")
+    print("{}: {} {} {} {} {}".format(
+        type(backend).__name__, users, deleted, counts, logged_out,
+        backend.count()))
+
+backend = UserSessionBackend(0)
+session_id = str(uuid.uuid4())
+backend.create(session_id, "carol")
+print("Without duration: {} {} {}".format(
+    backend.get(session_id), backend.reap(), backend.count()))
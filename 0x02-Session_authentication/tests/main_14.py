@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+""" Main 14: worker processes writing to the same User store
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+WORKERS = 4
+SAVES = 1500
+MODES = [
+    ("journal", {}),
+    ("mapped snapshot", {"MODELS_SHARED": "User"}),
+    ("4 shards", {"MODELS_SHARDS": "4"}),
+    ("4 mapped shards", {"MODELS_SHARDS": "4", "MODELS_SHARED": "User"}),
+    ("100 resident", {"MODELS_RESIDENT_MAX": "100"}),
+]
+
+
+def work(n):
+    """ save users, remove every third one, return a kept (id, email) """
+    from models.user import User
+    User.load_from_file()
+    kept = None
+    for i in range(SAVES):
+        user = User()
+        user.email = "p{}_{}@hbtn.io".format(n, i)
+        user.save()
+        if i % 3 == 0:
+            user.remove()
+        else:
+            kept = user.id, user.email
+    return kept
+
+
+def run_workers():
+    """ run the workers against the store of the current directory """
+    from models import base
+    from models.user import User
+    User.load_from_file()
+    spawn = multiprocessing.get_context("spawn")
+    with spawn.Pool(WORKERS) as pool:
+        results = pool.map(work, range(WORKERS))
+    seen = all(User.get(obj_id) is not None and
+               len(User.search({'email': email})) == 1
+               for obj_id, email in results)
+    synced = User.count()
+    User.load_from_file()
+    listed = sum(1 for _ in User.iter_all())
+    print("{} synced, {} reloaded, {} listed, workers' users found: {}, "
+          "snapshot: {}, in memory: {}".format(
+              synced, User.count(), listed, seen,
+              base.STORES['User'].snapshot is not None,
+              User.stats()['in_memory']))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["workers"]:
+        run_workers()
+        sys.exit(0)
+    print("Expected: {} users".format(WORKERS * SAVES * 2 // 3))
+    for name, env in MODES:
+        with tempfile.TemporaryDirectory() as cwd:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "workers"],
+                cwd=cwd, env=dict(os.environ, **env), capture_output=True,
+                text=True)
+        print("{}: {}".format(name, out.stdout.strip() or out.stderr))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+""" Main 15: bulk creation and deletion of users
+"""
+import importlib
+import os
+
+os.environ['AUTH_TYPE'] = ""
+
+# The app reads its settings on import
+app = importlib.import_module('api.v1.app').app
+User = importlib.import_module('models.user').User
+
+client = app.test_client()
+body = [{'email': "u{}@hbtn.io".format(i), 'password': "pwd{}".format(i)}
+        for i in range(100)]
+body.insert(50, {'email': "nopwd@hbtn.io"})
+body.insert(10, "not a user")
+response = client.post("/api/v1/users/bulk", json=body)
+results = response.get_json()
+print("Bulk create: {} {} items".format(response.status_code, len(results)))
+print("Errors: {}".format([(i, result['error'])
+                           for i, result in enumerate(results)
+                           if 'error' in result]))
+created = [result for result in results if 'error' not in result]
+print("In order: {}".format([result['email'] for result in created] ==
+                            ["u{}@hbtn.io".format(i) for i in range(100)]))
+print("Count: {}".format(User.count()))
+user = User.search({'email': "u42@hbtn.io"})[0]
+print("Found by email: {} {}".format(user.id == created[42]['id'],
+                                     user.is_valid_password("pwd42")))
+
+response = client.post("/api/v1/users/bulk", json=[{'email': "x@hbtn.io"}])
+print("Nothing created: {} {}".format(response.status_code,
+                                      response.get_json()))
+response = client.post("/api/v1/users/bulk", json={'email': "x@hbtn.io"})
+print("Not a list: {} {}".format(response.status_code, response.get_json()))
+
+ids = [result['id'] for result in created[:60]]
+ids.insert(3, "unknown")
+response = client.delete("/api/v1/users/bulk", json=ids)
+results = response.get_json()
+print("Bulk delete: {} {} items, errors at {}".format(
+    response.status_code, len(results),
+    [i for i, result in enumerate(results) if result]))
+print("Count: {}".format(User.count()))
+print("Deleted gone: {}".format(User.get(created[0]['id']) is None and
+                                not User.search({'email': "u0@hbtn.io"})))
+response = client.delete("/api/v1/users/bulk", json=ids[:3])
+print("Deleted again: {}".format(response.get_json()))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+""" Main 16: excluded paths trie against a plain scan of the list
+"""
+import itertools
+from api.v1.auth.auth import Auth
+
+
+def scanned(path, excluded_paths):
+    """ tell if a path requires authentication, one excluded path at a time """
+    if path is None or not excluded_paths:
+        return True
+    path = path.rstrip('/')
+    for excluded_path in excluded_paths:
+        if excluded_path.endswith('*'):
+            if path.startswith(excluded_path.rstrip('*')):
+                return False
+        else:
+            excluded_path = excluded_path.rstrip('/')
+            if path == excluded_path or path.startswith(excluded_path + '/'):
+                return False
+    return True
+
+
+lists = [
+    ["/api/v1/status/"],
+    ["/api/v1/status/", "/api/v1/unauthorized/", "/api/v1/forbidden/"],
+    ["/api/v1/stat*"],
+    ["/api/v1/stat*", "/api/v1/status/", "/api/v1/users/me/"],
+    ["/api/v1/auth_session/login/", "/api/v1/auth*"],
+    ["/"],
+    ["*"],
+    [],
+]
+paths = ["/api/v1/status", "/api/v1/status/", "/api/v1/status/ready",
+         "/api/v1/stats", "/api/v1/stats/", "/api/v1/statu", "/api/v1/sta",
+         "/api/v1/statuses", "/api/v1/users", "/api/v1/users/me",
+         "/api/v1/users/me/", "/api/v1/users/meta", "/api/v1/auth_session",
+         "/api/v1/auth_session/login", "/api/v1/unauthorized//", "/api",
+         "/", "", None]
+
+auth = Auth()
+mismatches = []
+for excluded_paths, path in itertools.product(lists, paths):
+    for _ in range(2):
+        # The second pass is answered from the decisions kept by path
+        if auth.require_auth(path, excluded_paths) != \
+                scanned(path, excluded_paths):
+            mismatches.append((path, excluded_paths))
+print("Mismatches: {}".format(mismatches))
+
+# Lists switch back and forth: each one is compiled again
+excluded = ["/api/v1/status/"]
+other = ["/api/v1/users/"]
+print("Switching lists: {}".format([
+    auth.require_auth("/api/v1/status", excluded_paths)
+    for excluded_paths in (excluded, other, excluded, other)]))
+
+# More paths than decisions kept
+many = ["/api/v1/users/{}".format(i) for i in range(5000)]
+print("Many paths: {}".format(
+    all(auth.require_auth(path, other) is False for path in many) and
+    all(auth.require_auth(path, excluded) for path in many)))
+print("Decisions kept: {}".format(len(auth._decisions)))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+""" Main 17: sessions capped per user and logged out everywhere at once
+"""
+import importlib
+import os
+
+os.environ['AUTH_TYPE'] = "session_auth"
+os.environ['SESSION_NAME'] = "_my_session_id"
+os.environ['SESSION_MAX_PER_USER'] = "3"
+
+# The app reads its settings on import
+app = importlib.import_module('api.v1.app').app
+auth = importlib.import_module('api.v1.app').auth
+User = importlib.import_module('models.user').User
+
+for email in ("bob@hbtn.io", "alice@hbtn.io"):
+    user = User()
+    user.email = email
+    user.password = "pwd"
+    user.save()
+
+
+def log_in(email):
+    """ test client holding a new session of a user """
+    client = app.test_client()
+    client.post("/api/v1/auth_session/login",
+                data={'email': email, 'password': "pwd"})
+    return client
+
+
+def statuses(clients):
+    """ status of GET /api/v1/users/me for each client """
+    return [client.get("/api/v1/users/me").status_code for client in clients]
+
+
+bob = [log_in("bob@hbtn.io") for _ in range(5)]
+alice = log_in("alice@hbtn.io")
+print("Bob's sessions, oldest first: {}".format(statuses(bob)))
+print("Alice: {}".format(statuses([alice])))
+
+response = bob[-1].delete("/api/v1/auth_session/logout_all")
+print("Logout all: {} {}".format(response.status_code, response.get_json()))
+print("Bob's sessions: {}".format(statuses(bob)))
+print("Alice: {}".format(statuses([alice])))
+response = bob[-1].delete("/api/v1/auth_session/logout_all")
+print("Logout all again: {}".format(response.status_code))
+
+bob.append(log_in("bob@hbtn.io"))
+print("New session: {}".format(statuses(bob[-1:])))
+print("Sessions indexed: {}".format(
+    {User.get(user_id).email: len(session_ids) for user_id, session_ids
+     in auth.session_ids_by_user_id.items()}))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Main 18: sliding session expiration, refreshed in batches
+"""
+import os
+import time
+from api.v1.auth.session_exp_auth import SessionExpAuth
+
+os.environ['SESSION_DURATION'] = "10"
+os.environ['SESSION_REFRESH_INTERVAL'] = "4"
+os.environ['SESSION_FLUSH_INTERVAL'] = "0.05"
+
+# Deadlines follow this clock, the flush timer real time
+now = 1000000000
+time.time = lambda: now
+
+auth = SessionExpAuth()
+batches = []
+touch_many = auth.backend.touch_many
+
+
+def counted_touch_many(new_deadlines):
+    """ record the size of each batch of new deadlines """
+    batches.append(len(new_deadlines))
+    return touch_many(new_deadlines)
+
+
+auth.backend.touch_many = counted_touch_many
+
+
+def deadlines(session_ids):
+    """ deadline of each session in the backend, offset from the start """
+    return [auth.backend.get(session_id)[1] - 1000000000
+            for session_id in session_ids]
+
+
+used = auth.create_session("bob")
+idle = auth.create_session("bob")
+others = [auth.create_session("alice") for _ in range(10)]
+print("Created: {}".format(deadlines([used, idle])))
+
+now += 3
+auth.user_id_for_session_id(used)
+time.sleep(0.2)
+print("Used before the refresh interval: {} {}".format(
+    deadlines([used]), batches))
+
+now += 2
+for _ in range(100):
+    for session_id in [used] + others:
+        auth.user_id_for_session_id(session_id)
+print("Queued before the flush: {} {}".format(len(auth._refreshed),
+                                              deadlines([used])))
+time.sleep(0.2)
+print("Flushed: {} {} {}".format(deadlines([used, idle]),
+                                 deadlines(others) == [15] * 10, batches))
+
+now += 7
+print("After the first deadline: {} {}".format(
+    auth.user_id_for_session_id(used), auth.user_id_for_session_id(idle)))
+print("Counts: {}".format(auth.session_counts()))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+""" Main 19: searches by email and session id behind Bloom filters
+"""
+import multiprocessing
+from models import base
+from models.user import User
+from models.user_session import UserSession
+
+
+def save_user(email):
+    """ save a user from another process """
+    User.load_from_file()
+    user = User()
+    user.email = email
+    user.save()
+
+
+if __name__ == "__main__":
+    User.load_from_file()
+    users = []
+    for i in range(2000):
+        user = User()
+        user.email = "u{}@hbtn.io".format(i)
+        users.append(user)
+    User.save_many(users)
+
+    print("Unknown email: {}".format(User.search({'email': "x@hbtn.io"})))
+    bloom = base.FILTERS['User']['email']
+    print("Filter built: {} for {} values".format(bloom.count,
+                                                  bloom.capacity))
+    print("Known emails found: {}".format(
+        all(len(User.search({'email': user.email})) == 1
+            for user in users)))
+    positives = sum(1 for i in range(10000)
+                    if "x{}@hbtn.io".format(i) in bloom)
+    print("False positives under 2%: {}".format(positives < 200))
+
+    user = users[0]
+    user.email = "renamed@hbtn.io"
+    user.save()
+    users[1].remove()
+    print("Renamed: {} {}".format(
+        [u.id for u in User.search({'email': "renamed@hbtn.io"})] ==
+        [user.id], User.search({'email': "u0@hbtn.io"})))
+    print("Removed: {} {}".format(User.search({'email': "u1@hbtn.io"}),
+                                  "u1@hbtn.io" in bloom))
+
+    spawn = multiprocessing.get_context("spawn")
+    worker = spawn.Process(target=save_user, args=("other@hbtn.io",))
+    worker.start()
+    worker.join()
+    print("Saved by another process: {}".format(
+        len(User.search({'email': "other@hbtn.io"}))))
+
+    more = []
+    for i in range(3000):
+        user = User()
+        user.email = "v{}@hbtn.io".format(i)
+        more.append(user)
+    User.save_many(more)
+    print("Dropped when full: {}".format('email' not in base.FILTERS['User']))
+    print("Rebuilt: {} {}".format(
+        len(User.search({'email': "v2999@hbtn.io"})),
+        base.FILTERS['User']['email'].capacity))
+
+    UserSession.load_from_file()
+    session = UserSession(user_id=users[2].id, session_id="s-1")
+    session.save()
+    print("Sessions: {} {}".format(
+        [s.user_id == users[2].id
+         for s in UserSession.search({'session_id': "s-1"})],
+        UserSession.search({'session_id': "made-up"})))
+    print("Session filter: {}".format(
+        "made-up" in base.FILTERS['UserSession']['session_id']))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+""" Main 20: sweeping expired sessions out of the UserSession store
+"""
+import subprocess
+import sys
+import time
+import uuid
+from api.v1.auth.session_sweeper import start_sweeper, sweep
+from models.user_session import UserSession
+
+DURATION = 60
+real_time = time.time
+
+
+def save_sessions(count, age=0):
+    """ save sessions last used `age` seconds ago, return their ids """
+    time.time = lambda: real_time() - age
+    sessions = [UserSession(user_id="bob", session_id=str(uuid.uuid4()))
+                for _ in range(count)]
+    UserSession.save_many(sessions)
+    time.time = real_time
+    return [session.session_id for session in sessions]
+
+
+UserSession.load_from_file()
+expired = save_sessions(600, age=1000)
+live = save_sessions(400)
+disk_bytes = UserSession.stats()['disk_bytes']
+print("Before: {}".format(UserSession.count()))
+print("Swept: {} {}".format(sweep(DURATION), UserSession.count()))
+print("Store shrank: {}".format(
+    UserSession.stats()['disk_bytes'] < disk_bytes / 2))
+UserSession.load_from_file()
+print("Reloaded: {} {} {}".format(
+    UserSession.count(),
+    any(UserSession.search({'session_id': session_id})
+        for session_id in expired),
+    all(UserSession.search({'session_id': session_id})
+        for session_id in live)))
+print("Nothing left to sweep: {}".format(sweep(DURATION)))
+print("Without duration: {}".format(sweep(0)))
+
+save_sessions(5, age=1000)
+out = subprocess.run([sys.executable, "-m", "api.v1.auth.session_sweeper",
+                      str(DURATION)], capture_output=True, text=True)
+print("Command: {}".format(out.stdout.strip() or out.stderr))
+print("After the command: {}".format(UserSession.count()))
+
+save_sessions(10, age=1000)
+start_sweeper(DURATION, 0.1)
+time.sleep(0.5)
+print("Background sweep: {}".format(UserSession.count()))
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+""" Main 5: stress models.base from many threads
+"""
+import sys
+import threading
+from models.user import User
+
+THREADS = 16
+ROUNDS = 50
+errors = []
+
+
+def worker(n):
+    """ save, search and remove users in a loop """
+    try:
+        for i in range(ROUNDS):
+            user = User()
+            user.email = "stress{}_{}@hbtn.io".format(n, i)
+            user.save()
+            User.search({'email': user.email})
+            User.count()
+            if i % 2:
+                user.remove()
+    except Exception as e:
+        errors.append(e)
+
+
+# Switch threads as often as possible to surface races
+sys.setswitchinterval(1e-6)
+User.load_from_file()
+start = User.count()
+threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+
+print("Errors: {}".format(errors))
+print("Users added: {}".format(User.count() - start))
+User.load_from_file()
+print("Users on disk: {}".format(User.count() - start))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+""" Main 6: SessionTable against a dict, through random operations
+"""
+import random
+import uuid
+from api.v1.auth.session_table import SessionTable
+
+ROUNDS = 20000
+random.seed(6)
+users = ["user{}".format(i) for i in range(20)]
+session_ids = [str(uuid.uuid4()) for _ in range(2000)]
+# Time of the table, only going forward
+clock = 0
+
+# Start small so that the index is resized many times
+table = SessionTable(capacity=8)
+sessions = {}
+by_user = {user: {} for user in users}
+errors = []
+
+
+def check(label):
+    """ compare the table with the dicts """
+    if len(table) != len(sessions):
+        errors.append("{}: {} sessions, expected {}".format(
+            label, len(table), len(sessions)))
+    for session_id in random.sample(session_ids, 50):
+        if table.get(session_id) != sessions.get(session_id):
+            errors.append("{}: get {}".format(label, session_id))
+    for user in random.sample(users, 3):
+        if table.user_sessions(user) != list(by_user[user]):
+            errors.append("{}: user_sessions {}".format(label, user))
+
+
+for i in range(ROUNDS):
+    session_id = random.choice(session_ids)
+    operation = random.random()
+    if operation < 0.69:
+        user = random.choice(users)
+        deadline = random.choice((0, clock + random.randint(-20, 80)))
+        table.add(session_id, user, deadline)
+        old = sessions.pop(session_id, None)
+        if old is not None:
+            del by_user[old[0]][session_id]
+        sessions[session_id] = (user, deadline)
+        by_user[user][session_id] = None
+    elif operation < 0.99:
+        removed = table.remove(session_id)
+        if removed != sessions.pop(session_id, None):
+            errors.append("{}: remove {}".format(i, session_id))
+        if removed is not None:
+            del by_user[removed[0]][session_id]
+    else:
+        clock += random.randint(0, 3)
+        now = clock
+        expired = [session_id for session_id, (_, deadline)
+                   in sessions.items() if 0 < deadline < now]
+        if table.counts(now) != (len(sessions) - len(expired),
+                                 len(expired)):
+            errors.append("{}: counts".format(i))
+        if table.sweep(now) != len(expired):
+            errors.append("{}: sweep".format(i))
+        for session_id in expired:
+            user, _ = sessions.pop(session_id)
+            del by_user[user][session_id]
+    if i % 100 == 0:
+        check(i)
+
+check("end")
+print("Errors: {}".format(errors[:10]))
+print("Sessions: {}".format(len(table)))
+print("Listed: {}".format(sorted(s for s, _, _ in table) == sorted(sessions)))
+print("Unknown id: {}".format(table.get("not a uuid")))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+""" Main 7: snapshot and restore the sessions kept in memory
+"""
+import random
+import time
+import uuid
+from api.v1.auth.session_backend import CompactMemoryBackend, MemoryBackend
+
+random.seed(7)
+now = int(time.time())
+users = ["user{}".format(i) for i in range(30)]
+created = []
+for i in range(1000):
+    deadline = random.choice([0, now + 3600, now - 10])
+    created.append((str(uuid.uuid4()), random.choice(users), deadline))
+expected = {session_id: (user, deadline)
+            for session_id, user, deadline in created
+            if deadline == 0 or deadline >= now}
+
+
+def user_sessions(backend, user):
+    """ session ids of a user, oldest first """
+    if isinstance(backend, CompactMemoryBackend):
+        return backend.table.user_sessions(user)
+    return list(backend.by_user.get(user, ()))
+
+
+for backend_class in (MemoryBackend, CompactMemoryBackend):
+    for fork in (False, True):
+        backend = backend_class()
+        for session_id, user, deadline in created:
+            backend.create(session_id, user, deadline)
+        written = backend.snapshot("sessions.snap", fork)
+
+        restored = backend_class()
+        count = restored.restore("sessions.snap")
+        mismatches = sum(1 for session_id, _, _ in created
+                         if restored.get(session_id) !=
+                         expected.get(session_id))
+        ordered = all(user_sessions(restored, user) ==
+                      [session_id for session_id in user_sessions(backend,
+                                                                  user)
+                       if session_id in expected]
+                      for user in users)
+        print("{} fork={}: written {}, restored {} of {}, mismatches {}, "
+              "ordered {}".format(backend_class.__name__, fork, written,
+                                  count, len(expected), mismatches, ordered))
+
+with open("sessions.snap", "r+b") as f:
+    f.truncate(100)
+print("Truncated snapshot: {}".format(
+    CompactMemoryBackend().restore("sessions.snap")))
+print("Missing snapshot: {}".format(
+    MemoryBackend().restore("missing.snap")))
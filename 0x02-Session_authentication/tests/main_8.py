@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+""" Main 8: signed sessions - verify, rotate keys and revoke
+"""
+import os
+import time
+from api.v1.auth.signed_session_auth import SignedSessionAuth
+
+
+class Request():
+    """ request carrying a session cookie """
+
+    def __init__(self, session_id):
+        """ set the session cookie """
+        self.cookies = {os.environ['SESSION_NAME']: session_id}
+
+
+os.environ['SESSION_NAME'] = "_my_session_id"
+os.environ['SESSION_DURATION'] = "60"
+
+os.environ['SESSION_KEYS'] = "k1:first secret"
+sa = SignedSessionAuth()
+session_1 = sa.create_session("abcde")
+print("Valid: {}".format(sa.user_id_for_session_id(session_1)))
+print("Other user: {}".format(
+    sa.user_id_for_session_id("fghij" + session_1[len("abcde"):])))
+print("Bad signature: {}".format(
+    sa.user_id_for_session_id(session_1[:-1] +
+                              ("A" if session_1[-1] != "A" else "B"))))
+print("Garbage: {}".format(sa.user_id_for_session_id("abcde.1.2")))
+
+os.environ['SESSION_KEYS'] = "k2:second secret,k1:first secret"
+rotating = SignedSessionAuth()
+session_2 = rotating.create_session("abcde")
+print("Signed with k2: {}".format(session_2.split('.')[-2] == "k2"))
+print("Old key still accepted: {}".format(
+    rotating.user_id_for_session_id(session_1)))
+
+os.environ['SESSION_KEYS'] = "k2:second secret"
+rotated = SignedSessionAuth()
+print("Old key dropped: {}".format(rotated.user_id_for_session_id(session_1)))
+print("New key accepted: {}".format(
+    rotated.user_id_for_session_id(session_2)))
+
+session_3 = rotated.create_session("abcde")
+session_4 = rotated.create_session("abcde")
+print("Same time, distinct: {}".format(session_3 != session_4))
+print("Logout: {}".format(rotated.destroy_session(Request(session_3))))
+print("Logged out: {}".format(rotated.user_id_for_session_id(session_3)))
+print("Other session kept: {}".format(
+    rotated.user_id_for_session_id(session_4)))
+print("Logout again: {}".format(rotated.destroy_session(Request(session_3))))
+
+rotated.destroy_user_sessions("abcde")
+print("After logout everywhere: {} {}".format(
+    rotated.user_id_for_session_id(session_2),
+    rotated.user_id_for_session_id(session_4)))
+session_5 = rotated.create_session("abcde")
+print("New login right after: {}".format(
+    rotated.user_id_for_session_id(session_5)))
+
+rotated.session_duration = 1
+session_6 = rotated.create_session("abcde")
+time.sleep(2)
+print("Expired: {}".format(rotated.user_id_for_session_id(session_6)))
+
+# Two workers sharing their revocations through SQLite
+os.environ['SESSION_BACKEND'] = "sqlite"
+os.environ['SESSION_BACKEND_PATH'] = ".signed_sessions.db"
+os.environ['SESSION_REVOCATION_SYNC'] = "0.5"
+worker_1, worker_2 = SignedSessionAuth(), SignedSessionAuth()
+lookups = []
+get_many = worker_2.backend.get_many
+worker_2.backend.get_many = lambda keys: lookups.append(keys) or \
+    get_many(keys)
+session_7 = worker_1.create_session("abcde")
+for _ in range(100):
+    worker_2.user_id_for_session_id(session_7)
+print("Backend lookups of a valid session: {}".format(len(lookups)))
+worker_1.destroy_session(Request(session_7))
+print("Revoked on its worker: {}".format(
+    worker_1.user_id_for_session_id(session_7)))
+time.sleep(1)
+print("Revoked on the other worker: {}".format(
+    worker_2.user_id_for_session_id(session_7)))
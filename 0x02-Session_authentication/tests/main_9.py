@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+""" Main 9: throttle the requests checking a password with 429
+"""
+import importlib
+import os
+import sys
+
+os.environ['AUTH_TYPE'] = "session_auth"
+os.environ['SESSION_NAME'] = "_my_session_id"
+os.environ['RATE_LIMIT'] = "3/60"
+if len(sys.argv) > 1:
+    # Buckets shared by the workers through a file
+    os.environ['RATE_LIMIT_FILE'] = sys.argv[1]
+
+# The app reads its settings on import
+api = importlib.import_module('api.v1.app')
+app, limiter = api.app, api.limiter
+User = importlib.import_module('models.user').User
+
+user = User()
+user.email = "bob@hbtn.io"
+user.password = "H0lbertonSchool98!"
+user.save()
+print("Limiter: {}".format(type(limiter).__name__))
+
+
+def login(client, email, password="wrong"):
+    """ try to log in, return the status and Retry-After """
+    response = client.post('/api/v1/auth_session/login',
+                           data={'email': email, 'password': password})
+    return response.status_code, response.headers.get('Retry-After')
+
+
+client_a = app.test_client()
+client_a.environ_base['REMOTE_ADDR'] = "10.0.0.1"
+client_b = app.test_client()
+client_b.environ_base['REMOTE_ADDR'] = "10.0.0.2"
+
+for i in range(4):
+    print("IP A, bob: {} {}".format(*login(client_a, "bob@hbtn.io")))
+print("IP A, right password: {} {}".format(
+    *login(client_a, "bob@hbtn.io", "H0lbertonSchool98!")))
+print("IP A, status: {}".format(
+    client_a.get('/api/v1/status').status_code))
+print("IP B, bob: {} {}".format(*login(client_b, "bob@hbtn.io")))
+print("IP B, alice: {} {}".format(*login(client_b, "alice@hbtn.io")))
@@ -12,9 +12,38 @@ The app responds to GET requests at the root URL with a JSON message.
 from typing import Tuple, Union
 from flask import Flask, request, jsonify, abort, make_response, redirect
 from auth import Auth
+from rate_limit import rate_limiter_from_env
+import math
 
 app = Flask(__name__)
 AUTH = Auth()
+LIMITER = rate_limiter_from_env()
+# Routes hashing a password, throttled by client IP and email
+HASHING_ROUTES = {('POST', '/sessions'), ('POST', '/users'),
+                  ('PUT', '/reset_password')}
+
+
+@app.before_request
+def throttle() -> Union[None, tuple]:
+    """
+    Reject the requests about to hash a password once the client IP or
+    the email ran out of tokens, before any hashing.
+
+    Returns:
+        None to go on with the request, or a 429 response with the
+        Retry-After header.
+    """
+    if LIMITER is None or (request.method, request.path) not in \
+            HASHING_ROUTES:
+        return None
+    retry_after = LIMITER.hit('ip:{}'.format(request.remote_addr))
+    email = request.form.get('email')
+    if not retry_after and email:
+        retry_after = LIMITER.hit('email:{}'.format(email))
+    if retry_after:
+        return jsonify({"message": "too many requests"}), 429, \
+            {'Retry-After': str(math.ceil(retry_after))}
+    return None
 
 
 @app.route("/", methods=["GET"])
@@ -6,12 +6,19 @@ Authentication module for the authentication database.
 
 from typing import Union
 import bcrypt
+from bloom_filter import BloomFilter
 from db import DB
+import threading
+import time
 import uuid
 from user import User
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.exc import InvalidRequestError
 
+# Seconds between two rebuilds of the filters of known emails and session
+# IDs while other connections keep committing to the database
+FILTER_REBUILD_INTERVAL = 1
+
 
 def _hash_password(password: str) -> bytes:
     """
@@ -43,10 +50,72 @@ def _generate_uuid() -> str:
 
 
 class Auth:
-    """Auth class to interact with the authentication database."""
+    """Auth class to interact with the authentication database.
+
+    Known emails and session IDs are kept in Bloom filters, so that an
+    unknown one, such as a made-up session_id cookie, is turned down
+    without querying the database. The filters are rebuilt from the
+    database once another connection committed to it, at most every
+    FILTER_REBUILD_INTERVAL seconds: in between, lookups go to the
+    database.
+    """
 
     def __init__(self):
         self._db = DB()
+        self._filters = {}
+        self._filters_lock = threading.Lock()
+        self._data_version = None
+        self._filters_built_at = -FILTER_REBUILD_INTERVAL
+
+    def _may_exist(self, column: str, value: str) -> bool:
+        """
+        Tell if a user may have a value in a column.
+
+        Args:
+            column (str): The column, 'email' or 'session_id'.
+            value (str): The value to look for.
+
+        Returns:
+            bool: False only if the filter of the column is up to date
+            and never saw the value.
+        """
+        if not isinstance(value, str):
+            return True
+        with self._filters_lock:
+            data_version = self._db.data_version()
+            if data_version != self._data_version:
+                now = time.monotonic()
+                if now - self._filters_built_at < FILTER_REBUILD_INTERVAL:
+                    return True
+                self._filters = {}
+                self._data_version = data_version
+                self._filters_built_at = now
+            bloom = self._filters.get(column)
+            if bloom is None:
+                values = self._db.column_values(column)
+                bloom = BloomFilter(max(1024, 2 * len(values)))
+                for known in values:
+                    bloom.add(known)
+                self._filters[column] = bloom
+            return value in bloom
+
+    def _remember(self, column: str, value: str) -> None:
+        """
+        Add a value just written to a column to the filter of the column,
+        dropping the filter once it holds more values than it was sized
+        for.
+
+        Args:
+            column (str): The column, 'email' or 'session_id'.
+            value (str): The value written.
+        """
+        with self._filters_lock:
+            bloom = self._filters.get(column)
+            if bloom is None:
+                return
+            bloom.add(value)
+            if bloom.count > bloom.capacity:
+                del self._filters[column]
 
     def register_user(self, email: str, password: str) -> User:
         """
@@ -62,18 +131,24 @@ class Auth:
         Raises:
             ValueError: If a user with the given email already exists.
         """
-        try:
-            # Check if user already exists
-            self._db.find_user_by(email=email)
-            raise ValueError(f"User {email} already exists")
-        except NoResultFound:
-            # User doesn't exist, so we can create a new one
-            hashed_password = _hash_password(password)
-            new_user = self._db.add_user(email, hashed_password)
-            return new_user
+        # Check if user already exists
+        if self._may_exist('email', email):
+            try:
+                self._db.find_user_by(email=email)
+                raise ValueError(f"User {email} already exists")
+            except NoResultFound:
+                pass
+
+        # User doesn't exist, so we can create a new one
+        hashed_password = _hash_password(password)
+        new_user = self._db.add_user(email, hashed_password)
+        self._remember('email', email)
+        return new_user
 
     def valid_login(self, email: str, password: str) -> bool:
         """Validate a user's login credentials."""
+        if not self._may_exist('email', email):
+            return False
         try:
             user = self._db.find_user_by(email=email)
             return bcrypt.checkpw(
@@ -85,10 +160,13 @@ class Auth:
 
     def create_session(self, email: str) -> str:
         """Create a session ID for the user."""
+        if not self._may_exist('email', email):
+            return None
         try:
             user = self._db.find_user_by(email=email)
             session_id = _generate_uuid()
             self._db.update_user(user.id, session_id=session_id)
+            self._remember('session_id', session_id)
             return session_id
         except NoResultFound:
             return None
@@ -104,7 +182,8 @@ class Auth:
             User or None: The corresponding User object if found,
             otherwise None.
         """
-        if session_id is None:
+        if session_id is None or \
+                not self._may_exist('session_id', session_id):
             return None
 
         try:
@@ -146,6 +225,8 @@ class Auth:
         Raises:
             ValueError: If the user with the given email does not exist.
         """
+        if not self._may_exist('email', email):
+            raise ValueError("User with email {} does not exist".format(email))
         try:
             user = self._db.find_user_by(email=email)
         except NoResultFound:
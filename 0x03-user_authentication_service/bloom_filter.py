@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""
+Bloom filter of strings, answering "maybe" or "certainly not".
+"""
+
+import math
+
+
+class BloomFilter():
+    """ Set of strings answering "maybe" or "certainly not" in constant
+    memory
+
+    `capacity` strings can be added before the false positive rate goes
+    past `error_rate`. Strings can't be removed: rebuild the filter. Bit
+    positions come from `hash()`, so a filter is only meaningful in the
+    process that filled it. Not thread safe for writers.
+    """
+
+    def __init__(self, capacity: int = 1024, error_rate: float = 0.01):
+        """ Initialize an empty filter sized for `capacity` strings
+        """
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) /
+                                     math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> range:
+        """ Bit positions of a string before reduction modulo the size, by
+        double hashing the two halves of its hash
+        """
+        key_hash = hash(key) & 0xffffffffffffffff
+        step = (key_hash >> 32) | 1
+        start = key_hash & 0xffffffff
+        return range(start, start + self.hashes * step, step)
+
+    def add(self, key: str):
+        """ Add a string
+        """
+        bits, size = self._bits, self.size
+        for position in self._positions(key):
+            position %= size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        """ Tell if a string may have been added
+        """
+        bits, size = self._bits, self.size
+        for position in self._positions(key):
+            position %= size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
@@ -2,6 +2,7 @@
 
 """DB module
 """
+from typing import List
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -66,6 +67,37 @@ class DB:
         except InvalidRequestError:
             raise InvalidRequestError()
 
+    def column_values(self, name: str) -> List[str]:
+        """
+        List the values of a column of the users table, without NULLs.
+
+        Args:
+            name (str): The name of the column.
+
+        Returns:
+            List[str]: The values of the column, one per user.
+
+        Raises:
+            ValueError: If the users table has no such column.
+        """
+        column = User.__table__.columns.get(name)
+        if column is None:
+            raise ValueError(f"Invalid attribute: {name}")
+        return [value for value, in self._session.query(column)
+                .filter(column.isnot(None))]
+
+    def data_version(self) -> int:
+        """
+        Get the SQLite data version of the database, which changes once
+        another connection committed changes to it.
+
+        Returns:
+            int: The data version.
+        """
+        # Straight to the DBAPI connection: this runs on every lookup
+        connection = self._session.connection().connection
+        return connection.execute("PRAGMA data_version").fetchone()[0]
+
     def update_user(self, user_id: int, **kwargs) -> None:
         """
         Update user attributes based on the given user_id and
@@ -19,6 +19,26 @@ def register_user(email: str, password: str) -> None:
     assert response.status_code == 201
 
 
+def register_user_twice(email: str, password: str) -> None:
+    url = f"{BASE_URL}/users"
+    payload = {
+        "email": email,
+        "password": password
+    }
+    response = requests.post(url, data=payload)
+    assert response.status_code == 400
+
+
+def log_in_unknown_email(email: str, password: str) -> None:
+    url = f"{BASE_URL}/sessions"
+    payload = {
+        "email": email,
+        "password": password
+    }
+    response = requests.post(url, data=payload)
+    assert response.status_code == 401
+
+
 def log_in_wrong_password(email: str, password: str) -> None:
     url = f"{BASE_URL}/sessions"
     payload = {
@@ -55,6 +75,15 @@ def profile_logged(session_id: str) -> None:
     assert response.status_code == 200
 
 
+def profile_unknown_session(session_id: str) -> None:
+    url = f"{BASE_URL}/profile"
+    cookies = {
+        "session_id": session_id
+    }
+    response = requests.get(url, cookies=cookies)
+    assert response.status_code == 403
+
+
 def log_out(session_id: str) -> None:
     url = f"{BASE_URL}/sessions"
     cookies = {
@@ -88,15 +117,21 @@ def update_password(email: str, reset_token: str, new_password: str) -> None:
 EMAIL = "guillaume@holberton.io"
 PASSWD = "b4l0u"
 NEW_PASSWD = "t4rt1fl3tt3"
+UNKNOWN_EMAIL = "nobody@holberton.io"
+MADE_UP_SESSION_ID = "00000000-0000-4000-8000-000000000000"
 
 
 if __name__ == "__main__":
     register_user(EMAIL, PASSWD)
+    register_user_twice(EMAIL, PASSWD)
+    log_in_unknown_email(UNKNOWN_EMAIL, PASSWD)
     log_in_wrong_password(EMAIL, NEW_PASSWD)
     profile_unlogged()
+    profile_unknown_session(MADE_UP_SESSION_ID)
     session_id = log_in(EMAIL, PASSWD)
     profile_logged(session_id)
     log_out(session_id)
+    profile_unknown_session(session_id)
     reset_token = reset_password_token(EMAIL)
     update_password(EMAIL, reset_token, NEW_PASSWD)
     log_in(EMAIL, NEW_PASSWD)